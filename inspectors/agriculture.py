@@ -5,7 +5,6 @@ import logging
 import os
 from urllib.parse import urljoin
 
-from bs4 import BeautifulSoup
 from utils import utils, inspector
 
 # http://www.usda.gov/oig/rptsaudits.htm
@@ -182,7 +181,7 @@ def report_from(result, page_url, year_range, agency_slug="agriculture"):
 
 def beautifulsoup_from_url(url):
   body = utils.download(url)
-  return BeautifulSoup(body)
+  return utils.parse_html(body)
 
 
 utils.run(run) if (__name__ == "__main__") else None
\ No newline at end of file
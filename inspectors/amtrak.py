@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 
 from utils import utils, inspector
-from bs4 import BeautifulSoup
 from datetime import datetime
 import logging
 
@@ -24,7 +23,7 @@ def run(options):
       url = url_for(options, page, year)
       body = utils.download(url)
 
-      doc = BeautifulSoup(body)
+      doc = utils.parse_html(body)
 
       next_page = page + 1
       found_next_page = False
@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 
 from utils import utils, inspector
-from bs4 import BeautifulSoup
 from datetime import datetime
 import urllib.parse
 import logging
@@ -33,7 +32,7 @@ def run(options):
     url = url_for(options, component)
     body = utils.download(url)
 
-    doc = BeautifulSoup(body)
+    doc = utils.parse_html(body)
 
     results = doc.select("table.contentpaneopen table[border=1] tr")
     # accept only trs that look like body tr's (no 'align' attribute)
@@ -5,7 +5,6 @@ from urllib.parse import urljoin, urlencode
 import re
 import os
 import logging
-from bs4 import BeautifulSoup
 from utils import utils, inspector
 
 # http://www.dodig.mil/pubs/index.cfm
@@ -101,6 +100,9 @@ RE_FOIA = re.compile('Freedom (?:of|on) Information Act', re.I)
 RE_RESTRICTED = re.compile('Restricted', re.I)
 RE_AFGHANISTAN = re.compile('Provided to the Security Forces of Afghanistan', re.I)
 
+# Listing pages only need their report table and their pagination links
+LISTING_TAGS = ["table", "a"]
+
 def run(options):
   only = options.get('topics')
   if only:
@@ -110,8 +112,7 @@ def run(options):
     only = list(OFFICES.keys())
 
   for url in urls_for(options, only):
-    body = utils.download(url)
-    page = BeautifulSoup(body)
+    page = utils.beautifulsoup_from_url(url, only=LISTING_TAGS)
 
     report_table = page.select('table[summary~="reports"]')[0]
     for tr in report_table.select('tr')[1:]:
@@ -206,7 +207,7 @@ def fetch_from_landing_page(landing_url):
   skip = False
 
   body = utils.download(landing_url)
-  page = BeautifulSoup(body)
+  page = utils.parse_html(body)
 
   report_tables = page.select('table[summary~="reports"]')
   # in the rare case that doesn't work, have faith
@@ -286,8 +287,7 @@ def urls_for(options, only):
     url = '{0}?{1}'.format(BASE_URL, query_string)
     yield url
 
-    body = utils.download(url)
-    page = BeautifulSoup(body)
+    page = utils.beautifulsoup_from_url(url, only=LISTING_TAGS)
 
     for url in get_pagination_urls(page):
       yield url
@@ -303,7 +303,7 @@ def get_pagination_urls(page):
       yield BASE_URL + link['href']
     elif link['href'].startswith('/pubs') and RE_NEXT_10.search(link.text):
       new_url = urljoin(BASE_URL, link['href'])
-      page = BeautifulSoup(utils.download(new_url))
+      page = utils.beautifulsoup_from_url(new_url, only=LISTING_TAGS)
       for link in get_pagination_urls(page):
         yield link
 
@@ -5,7 +5,6 @@ from urllib.parse import urljoin, urlencode
 import re
 import os
 import logging
-from bs4 import BeautifulSoup
 from utils import utils, inspector
 
 # http://www.oig.dot.gov/
@@ -75,7 +74,7 @@ def run(options):
     for year_url in year_urls:
       body = utils.download(year_url)
 
-      doc = BeautifulSoup(body)
+      doc = utils.parse_html(body)
       results = doc.select(".item-list ul li")
 
       for result in results:
@@ -105,7 +104,7 @@ def report_from(result, year_range, topic):
   logging.debug("### Processing report %s" % landing_url)
 
   report_page_body = utils.download(landing_url)
-  report_page = BeautifulSoup(report_page_body)
+  report_page = utils.parse_html(report_page_body)
   summary = report_page.select(".summary-body")[0].text.strip()
 
   report_type = report_page.select("#content-wrapper div h2")[0].text
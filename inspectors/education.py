@@ -6,7 +6,6 @@ import os
 import re
 from urllib.parse import urljoin
 
-from bs4 import BeautifulSoup
 from utils import utils, inspector
 
 # https://www2.ed.gov/about/offices/list/oig/areports.html
@@ -119,13 +118,7 @@ def audit_report_from(result, page_url, year_range):
   else:
     # See notes to the IG Web team for some of this
     published_on_text = result.select("td")[2].text.strip().replace(")", "").replace("//", "/")
-    date_formats = ['%m/%d/%Y', '%m/%d/%y', '%m/%Y']
-    published_on = None
-    for date_format in date_formats:
-      try:
-        published_on = datetime.datetime.strptime(published_on_text, date_format)
-      except ValueError:
-        pass
+    published_on = utils.parse_date(published_on_text, ['%m/%d/%Y', '%m/%d/%y', '%m/%Y'])
 
   if published_on.year not in year_range:
     logging.debug("[%s] Skipping, not in requested range." % report_url)
@@ -220,7 +213,7 @@ def report_from(result, url, year_range):
 
 def beautifulsoup_from_url(url):
   body = utils.download(url)
-  return BeautifulSoup(body)
+  return utils.parse_html(body)
 
 
 utils.run(run) if (__name__ == "__main__") else None
\ No newline at end of file
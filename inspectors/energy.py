@@ -4,7 +4,6 @@ import datetime
 from urllib.parse import urljoin, urlencode
 import re
 import logging
-from bs4 import BeautifulSoup
 from utils import utils, inspector
 
 # website: http://energy.gov/ig/
@@ -92,13 +91,7 @@ class EnergyScraper(object):
     self.last_date = datetime.datetime(self.year_range[-1], 12, 31)
 
     for url in self.urls_for():
-      page = BeautifulSoup(utils.download(url))
-
-      nodes = page.select('.energy-listing__results .node')
-      if not nodes:
-        nodes = page.select('.field-items .node')
-      if not nodes:
-        nodes = page.select('.node')
+      nodes = utils.parse_cached(utils.download(url), nodes_from)
 
       for node in nodes:
         report = self.report_from(node)
@@ -116,21 +109,16 @@ class EnergyScraper(object):
       'agency_name': 'Department of Energy',
     }
 
-    date = node.select('.date')[0]
-    published_on = datetime.datetime.strptime(date.text, '%B %d, %Y')
+    published_on = datetime.datetime.strptime(listed(node, 'date'), '%B %d, %Y')
     if published_on < self.first_date or published_on > self.last_date:
       # Out of date range, skip this one.
       return
     published_on = published_on.strftime('%Y-%m-%d')
 
-    title_p = node.select('.field-item p')[0]
-    title = title_p.text.strip()
-
-    title_link = node.select('.title-link')[0]
-    landing_url = urljoin(BASE_URL, title_link['href'])
+    title = listed(node, 'title')
+    landing_url = urljoin(BASE_URL, listed(node, 'href'))
 
-    title_link_span = title_link.select('span')[0]
-    md = RE_REPORT_ID.search(title_link_span.text)
+    md = RE_REPORT_ID.search(listed(node, 'link_text'))
     if md:
       report['sub_type'] = md.group(1).strip().replace(' ', '_').lower()
       report_id = md.group(2).strip().replace('/', '-')
@@ -170,13 +158,8 @@ class EnergyScraper(object):
   def fetch_from_landing_page(self, landing_url):
     """Returns a tuple of (pdf_link, summary_text, is_unreleased)."""
     unreleased = False
-    page = BeautifulSoup(utils.download(landing_url))
+    report_url, summary = utils.parse_cached(utils.download(landing_url), landing_page_from)
 
-    summary = None
-    field_items = page.select('.field-items')
-    if field_items:
-      text = [node.strip() for node in field_items[0].findAll(text=True)]
-      summary = '\n\n'.join(text).strip()
     if not summary:
       logging.info('\tno summary text found')
 
@@ -186,12 +169,8 @@ class EnergyScraper(object):
                      or RE_CLASSIFIED.search(summary))):
       unreleased = True
 
-    report_url = None
-    pdf_link = page.select('.file a')
-    if not pdf_link:
+    if not report_url:
       logging.warn('No pdf link found on page: {0}'.format(landing_url))
-    else:
-      report_url = pdf_link[0]['href']
 
     return report_url, summary, unreleased
 
@@ -211,7 +190,7 @@ class EnergyScraper(object):
 
     # Not getting reports from specific topics, iterate over all Calendar Year
     # reports.
-    page = BeautifulSoup(utils.download(BASE_URL))
+    page = utils.parse_html(utils.download(BASE_URL))
 
     # Iterate over each "Calendar Year XXXX" link
     for li in page.select('.field-items li'):
@@ -227,7 +206,7 @@ class EnergyScraper(object):
           # Next, read all the pagination links for the page and yield those. So
           # far, I haven't seen a page that doesn't have all of the following
           # pages enumerated.
-          next_page = BeautifulSoup(utils.download(next_url))
+          next_page = utils.beautifulsoup_from_url(next_url)
           for link in next_page.select('li.pager-item a'):
             yield urljoin(BASE_URL, link['href'])
 
@@ -244,14 +223,14 @@ class EnergyScraper(object):
       last_page = False
 
       url = TOPIC_TO_URL[topic]
-      page = BeautifulSoup(utils.download(url))
+      page = utils.beautifulsoup_from_url(url)
       page_started = self.is_first_page(page)
       if page_started:
         yield url
 
       for link in page.select('li.pager-item a'):
         next_url = urljoin(url, link['href'])
-        next_page = BeautifulSoup(utils.download(next_url))
+        next_page = utils.beautifulsoup_from_url(next_url)
         if not page_started:
           page_started = self.is_first_page(next_page)
         if page_started:
@@ -277,6 +256,53 @@ class EnergyScraper(object):
         return True
     return False
 
+# What's needed from a listing page and a landing page, kept in plain lists
+# and dicts so that they can be cached (see utils.parse_cached). Fields a
+# node doesn't have are None, and only matter if the report is in range.
+def nodes_from(body):
+  page = utils.parse_html(body)
+
+  nodes = page.select('.energy-listing__results .node')
+  if not nodes:
+    nodes = page.select('.field-items .node')
+  if not nodes:
+    nodes = page.select('.node')
+
+  results = []
+  for node in nodes:
+    date = node.select('.date')
+    title_p = node.select('.field-item p')
+    title_link = node.select('.title-link')
+    title_link_span = title_link and title_link[0].select('span')
+    results.append({
+      'date': date[0].text if date else None,
+      'title': title_p[0].text.strip() if title_p else None,
+      'href': title_link[0].get('href') if title_link else None,
+      'link_text': title_link_span[0].text if title_link_span else None,
+    })
+  return results
+
+def listed(node, field):
+  if node[field] is None:
+    raise IndexError("No %s found for a report in the listing" % field)
+  return node[field]
+
+def landing_page_from(body):
+  page = utils.parse_html(body)
+
+  summary = None
+  field_items = page.select('.field-items')
+  if field_items:
+    text = [node.strip() for node in field_items[0].findAll(text=True)]
+    summary = '\n\n'.join(text).strip()
+
+  report_url = None
+  pdf_link = page.select('.file a')
+  if pdf_link:
+    report_url = pdf_link[0]['href']
+
+  return [report_url, summary]
+
 def run(options):
   EnergyScraper().run(options)
 
@@ -3,7 +3,6 @@
 import datetime
 from urllib.parse import urljoin
 import re
-from bs4 import BeautifulSoup
 from utils import utils, inspector
 
 # oldest year: 1996
@@ -48,6 +47,7 @@ ALL_TOPIC_AREAS = set(("A", "CB", "CC", "C", "CO", "X", "DWG", "EF", "E", "FM",
                        "RD", "RPP", "SR", "L", "W", "WTC"))
 BASE_URL = 'http://www.epa.gov/oig/reports.html'
 RE_YEAR = re.compile(r'\d{4}')
+RE_DATE_YEAR = re.compile(r'\d{1,2}/\d{1,2}/(\d{4})')
 
 def run(options):
   year_range = inspector.year_range(options)
@@ -61,33 +61,36 @@ def run(options):
   index_body = utils.download(BASE_URL)
 
   current_year = None
-  index = BeautifulSoup(index_body)
-  tables = index.select('table.style1')
-  for table in tables:
-    trs = table.select('tr')
-    for tr in trs:
-      tds = tr.select('td')
-      if len(tds) < 8:
-        if len(tds) == 1:
-          # Large column that indicates year
-          col_links = tds[0].select('a')
-          if len(col_links) == 1:
-            col_text = col_links[0].text
-            if RE_YEAR.match(col_text):
-              current_year = col_text
-        continue
-
-      published_on_dt = datetime.datetime.strptime(tds[6].text, '%m/%d/%Y')
-      if published_on_dt.year not in year_range:
-        continue
-
-      topic_areas = set(tds[7].text.split(', '))
-      if not len(topic_areas.intersection(only)):
-        continue
-
-      report = report_from(tds, published_on_dt, current_year)
-      if report:
-        inspector.save_report(report)
+  rows = utils.iter_elements(index_body, "tr", within=("table", {"class": "style1"}))
+  for row in rows:
+    # The index has every report ever, so rows whose dates are all outside
+    # the requested years are skipped before they're parsed
+    years = RE_DATE_YEAR.findall(row)
+    if years and not any(int(year) in year_range for year in years):
+      continue
+
+    tds = utils.parse_html("<table>%s</table>" % row).select('td')
+    if len(tds) < 8:
+      if len(tds) == 1:
+        # Large column that indicates year
+        col_links = tds[0].select('a')
+        if len(col_links) == 1:
+          col_text = col_links[0].text
+          if RE_YEAR.match(col_text):
+            current_year = col_text
+      continue
+
+    published_on_dt = datetime.datetime.strptime(tds[6].text, '%m/%d/%Y')
+    if published_on_dt.year not in year_range:
+      continue
+
+    topic_areas = set(tds[7].text.split(', '))
+    if not len(topic_areas.intersection(only)):
+      continue
+
+    report = report_from(tds, published_on_dt, current_year)
+    if report:
+      inspector.save_report(report)
 
 
 RE_PDF = re.compile('PDF', re.I)
@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 
 from utils import utils, inspector
-from bs4 import BeautifulSoup
 from bs4.element import Tag, NavigableString
 from datetime import datetime
 import re
@@ -13,7 +12,7 @@ def run(options):
 
   for page_url in [WHATS_NEW_URL]:
     body = utils.download(page_url)
-    doc = BeautifulSoup(body)
+    doc = utils.parse_html(body)
 
     maincontent = doc.select("div#CS_Element_eximpagemaincontent")[0]
     after_maincontent = maincontent.nextSibling
@@ -65,7 +64,7 @@ def run(options):
   for page_url in [WHATS_NEW_ARCHIVE_URL, PRESS_RELEASES_URL, PRESS_RELEASES_ARCHIVE_URL, SEMIANNUAL_REPORTS_AND_TESTIMONIES_URL]:
     done = False
     body = utils.download(page_url)
-    doc = BeautifulSoup(body)
+    doc = utils.parse_html(body)
 
     maincontent = doc.select("div#CS_Element_eximpagemaincontent")[0]
     all_p = maincontent.find_all("p")
@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 
 from utils import utils, inspector
-from bs4 import BeautifulSoup
 from datetime import datetime
 import re
 import logging
@@ -28,7 +27,7 @@ def crawl_index(base_url, options, is_meta_index=False):
     url = url_for(base_url, page)
     body = utils.download(url)
 
-    doc = BeautifulSoup(body)
+    doc = utils.parse_html(body)
 
     next_page = page + 1
     found_next_page = False
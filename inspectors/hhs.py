@@ -5,7 +5,6 @@ import logging
 import os
 from urllib.parse import urljoin, urlparse, urlunparse
 
-from bs4 import BeautifulSoup
 from utils import utils, inspector
 
 # https://oig.hhs.gov/reports-and-publications/index.asp
@@ -165,6 +164,16 @@ BLACKLIST_REPORT_URLS = [
 
 BASE_URL = "https://oig.hhs.gov"
 
+# how dates are written next to reports, once spaces are taken out
+DATE_FORMATS = [
+  '%m-%d-%Y',
+  '%m-%d-%y',
+  '%b%d,%Y',
+  '%B%d,%Y',
+  '%B,%d,%Y',
+  '%B%Y',
+]
+
 def run(options):
   year_range = inspector.year_range(options)
 
@@ -187,13 +196,17 @@ def extract_reports_for_topic(topic, year_range, archives=False):
   else:
     subtopic_map = {None: topic_url}
 
+  # Fetch all of the subtopic pages at once
+  subtopics = list(subtopic_map.items())
+  bodies = utils.download_many([subtopic_url for subtopic_name, subtopic_url in subtopics])
+
   topic_name = TOPIC_NAMES[topic]
-  for subtopic_name, subtopic_url in subtopic_map.items():
+  for (subtopic_name, subtopic_url), body in zip(subtopics, bodies):
     logging.debug("## Processing subtopic %s" % subtopic_name)
-    extract_reports_for_subtopic(subtopic_url, year_range, topic_name, subtopic_name)
+    extract_reports_for_subtopic(subtopic_url, body, year_range, topic_name, subtopic_name)
 
-def extract_reports_for_subtopic(subtopic_url, year_range, topic_name, subtopic_name):
-  doc = beautifulsoup_from_url(subtopic_url)
+def extract_reports_for_subtopic(subtopic_url, body, year_range, topic_name, subtopic_name):
+  doc = beautifulsoup_from_body(subtopic_url, body)
   if not doc:
     raise Exception("Failure fetching subtopic URL: %s" % subtopic_url)
 
@@ -208,16 +221,36 @@ def extract_reports_for_subtopic(subtopic_url, year_range, topic_name, subtopic_
     results = doc.select("#leftContentInterior ul li")
   if not results:
     results = doc.select("#leftContentInterior > p > a")
+
+  # Reports that can only be dated by their Last-Modified header are put off
+  # until the rest are done, and then looked up all at once.
+  deferred = []
   for result in results:
     if 'crossref' in result.parent.parent.attrs.get('class', []):
       continue
     if result.parent.parent.attrs.get('id') == 'related':
       continue
-    report = report_from(result, year_range, topic_name, subtopic_url, subtopic_name)
+    try:
+      report = report_from(result, year_range, topic_name, subtopic_url, subtopic_name, defer_head=True)
+    except NeedsHead as needs_head:
+      deferred.append((result, needs_head.url))
+      continue
     if report:
       inspector.save_report(report)
 
-def report_from(result, year_range, topic, subtopic_url, subtopic=None):
+  if deferred:
+    utils.head_many([url for result, url in deferred])
+    for result, url in deferred:
+      report = report_from(result, year_range, topic_name, subtopic_url, subtopic_name)
+      if report:
+        inspector.save_report(report)
+
+class NeedsHead(Exception):
+  def __init__(self, url):
+    super(NeedsHead, self).__init__(url)
+    self.url = url
+
+def report_from(result, year_range, topic, subtopic_url, subtopic=None, defer_head=False):
   # Ignore links to other subsections
   if result.get('class') and result['class'][0] == 'crossref':
     return
@@ -280,6 +313,7 @@ def report_from(result, year_range, topic, subtopic_url, subtopic=None):
         title,
         report_id,
         report_url,
+        defer_head,
       )
 
   if published_on.year not in year_range:
@@ -340,88 +374,91 @@ def get_published_date_from_tag(possible_tag):
   except (TypeError, IndexError):
     published_on_text = possible_tag.text
 
-  published_on_text = clean_published_text(published_on_text)
-
-  date_formats = [
-    '%m-%d-%Y',
-    '%m-%d-%y',
-    '%b%d,%Y',
-    '%B%d,%Y',
-    '%B,%d,%Y',
-    '%B%Y',
-  ]
-  for date_format in date_formats:
-    try:
-      return datetime.datetime.strptime(published_on_text, date_format)
-    except ValueError:
-      pass
+  published_on = utils.parse_date(clean_published_text(published_on_text), DATE_FORMATS)
+  if published_on:
+    return published_on
 
-  for date_format in date_formats:
-    try:
-      published_text = clean_published_text(possible_tag.contents[-1])
-      return datetime.datetime.strptime(published_text, date_format)
-    except (ValueError, TypeError, IndexError):
-      pass
+  try:
+    published_text = clean_published_text(possible_tag.contents[-1])
+  except (TypeError, IndexError):
+    return None
+  return utils.parse_date(published_text, DATE_FORMATS)
+
+def published_on_from_inline_link(result, report_filename, title, report_id, report_url, defer_head=False):
+  dt = result.find_previous("dt")
+  if dt is not None:
+    published_on = utils.parse_date(dt.text.strip(), ["%m-%d-%Y"])
+    if published_on:
+      return published_on
+
+  cite = result.find_next("cite")
+  if cite is not None:
+    cite_text = cite.text
+    if ';' in cite_text:
+      published_on_text = cite_text.split(";")[-1].rstrip(")")
+    elif ':' in cite_text:
+      published_on_text = cite_text.split(":")[-1].rstrip(")")
+    else:
+      published_on_text = cite_text.split(",")[-1].rstrip(")")
+    published_on = utils.parse_date(published_on_text.strip(), ['%m/%y'])
+    if published_on:
+      return published_on
 
-def published_on_from_inline_link(result, report_filename, title, report_id, report_url):
   try:
-    published_on_text = result.find_previous("dt").text.strip()
-    published_on = datetime.datetime.strptime(published_on_text, "%m-%d-%Y")
-  except (ValueError, AttributeError):
-    try:
-      cite_text = result.find_next("cite").text
-      if ';' in cite_text:
-        published_on_text = cite_text.split(";")[-1].rstrip(")")
-      elif ':' in cite_text:
-        published_on_text = cite_text.split(":")[-1].rstrip(")")
-      else:
-        published_on_text = cite_text.split(",")[-1].rstrip(")")
-      published_on = datetime.datetime.strptime(published_on_text.strip(), '%m/%y')
-    except (AttributeError, ValueError):
-      try:
-        fiscal_year = int(result.text.split(":")[0].split()[1])
-        published_on = datetime.datetime(fiscal_year - 1, 10, 1)
-      except (ValueError, IndexError):
-        try:
-          fiscal_year = int(report_filename.split("-")[0])
-          published_on = datetime.datetime(fiscal_year - 1, 10, 1)
-        except ValueError:
-          try:
-            published_on = datetime.datetime.strptime(title.replace(": ", ":"), "Compendium:%B %Y Edition")
-          except ValueError:
-            try:
-              published_on = datetime.datetime.strptime(report_id.split("-")[-1], "%m%d%Y")
-            except ValueError:
-              try:
-                report_year = int(report_url.split("/")[-2:-1][0])
-                published_on = datetime.datetime(report_year, 1, 1)
-              except (ValueError, IndexError):
-                try:
-                  fiscal_year = int(title.replace("Fiscal Year ", ""))
-                  published_on = datetime.datetime(fiscal_year - 1, 10, 1)
-                except ValueError:
-                  # Try using the last-modified header
-                  response = utils.scraper.request(method='HEAD', url=report_url)
-                  last_modified = response.headers['Last-Modified']
-                  published_on = datetime.datetime.strptime(last_modified, '%a, %d %b %Y %H:%M:%S %Z')
-                  if published_on.year < 2003:
-                    # We don't trust the last-modified for dates before 2003
-                    # since a lot of historical reports were published at this
-                    # time. For these reports, fallback to a hacky method based
-                    # on the report id. For example: oei-04-12-00490. These are
-                    # the dates that the report_id was assigned which is before
-                    # the report was actually published
-                    published_on_text = "-".join(report_id.split("-")[1:3])
-                    try:
-                      published_on = datetime.datetime.strptime(published_on_text, '%m-%y')
-                    except ValueError:
-                      pass
-                      # Fall back to the Last-Modified header
+    fiscal_year = int(result.text.split(":")[0].split()[1])
+    return datetime.datetime(fiscal_year - 1, 10, 1)
+  except (ValueError, IndexError):
+    pass
+
+  try:
+    fiscal_year = int(report_filename.split("-")[0])
+    return datetime.datetime(fiscal_year - 1, 10, 1)
+  except ValueError:
+    pass
+
+  published_on = utils.parse_date(title.replace(": ", ":"), ["Compendium:%B %Y Edition"])
+  if published_on:
+    return published_on
+
+  published_on = utils.parse_date(report_id.split("-")[-1], ["%m%d%Y"])
+  if published_on:
+    return published_on
+
+  try:
+    report_year = int(report_url.split("/")[-2:-1][0])
+    return datetime.datetime(report_year, 1, 1)
+  except (ValueError, IndexError):
+    pass
+
+  try:
+    fiscal_year = int(title.replace("Fiscal Year ", ""))
+    return datetime.datetime(fiscal_year - 1, 10, 1)
+  except ValueError:
+    pass
+
+  # Try using the last-modified header
+  if defer_head and not utils.has_head(report_url):
+    raise NeedsHead(report_url)
+  last_modified = utils.head(report_url)['last_modified']
+  published_on = datetime.datetime.strptime(last_modified, '%a, %d %b %Y %H:%M:%S %Z')
+  if published_on.year < 2003:
+    # We don't trust the last-modified for dates before 2003
+    # since a lot of historical reports were published at this
+    # time. For these reports, fallback to a hacky method based
+    # on the report id. For example: oei-04-12-00490. These are
+    # the dates that the report_id was assigned which is before
+    # the report was actually published
+    published_on_text = "-".join(report_id.split("-")[1:3])
+    # Fall back to the Last-Modified header
+    published_on = utils.parse_date(published_on_text, ['%m-%y']) or published_on
   return published_on
 
 def get_subtopic_map(topic_url):
   body = utils.download(topic_url)
-  doc = BeautifulSoup(body)
+  return utils.parse_cached(body, subtopic_map_from, topic_url)
+
+def subtopic_map_from(body, topic_url):
+  doc = utils.parse_html(body)
 
   subtopic_map = {}
   for link in doc.select("#leftContentInterior li a"):
@@ -435,13 +472,15 @@ def get_subtopic_map(topic_url):
   return subtopic_map
 
 def beautifulsoup_from_url(url):
-  body = utils.download(url)
-  if body is None: return None
+  return follow_meta_refresh(url, utils.beautifulsoup_from_url(url))
 
-  doc = BeautifulSoup(body)
+def beautifulsoup_from_body(url, body):
+  if body is None: return None
+  return follow_meta_refresh(url, utils.parse_html(body))
 
-  # Some of the pages will return meta refreshes
-  if doc.find("meta") and doc.find("meta").attrs.get('http-equiv') == 'REFRESH':
+# Some of the pages will return meta refreshes
+def follow_meta_refresh(url, doc):
+  if doc and doc.find("meta") and doc.find("meta").attrs.get('http-equiv') == 'REFRESH':
     redirect_url = urljoin(url, doc.find("meta").attrs['content'].split("url=")[1])
     return beautifulsoup_from_url(redirect_url)
   else:
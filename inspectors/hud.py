@@ -4,7 +4,6 @@ import datetime
 import logging
 import os
 from urllib.parse import urljoin
-from bs4 import BeautifulSoup
 from utils import utils, inspector
 
 #
@@ -51,7 +50,7 @@ def run(options):
 
     url = url_for(year_range, page=page)
     index_body = utils.download(url)
-    index = BeautifulSoup(index_body)
+    index = utils.parse_html(index_body)
 
     rows = index.select('div.views-row')
 
@@ -78,7 +77,7 @@ def report_from(report_row, year_range):
   logging.debug("### Processing report %s" % landing_url)
 
   report_page_body = utils.download(landing_url)
-  report_page = BeautifulSoup(report_page_body)
+  report_page = utils.parse_html(report_page_body)
 
   article = report_page.select('article')[0]
 
@@ -3,9 +3,9 @@
 import datetime
 import logging
 import os
+import re
 from urllib.parse import urljoin
 
-from bs4 import BeautifulSoup
 from utils import utils, inspector
 
 # http://www.doi.gov/oig/reports/index.cfm
@@ -33,14 +33,21 @@ POST_DATA = {
   'reportViewAll': 'View+All',
 }
 
+RE_REPORT_YEAR = re.compile(r'Report Date: *\d{1,2}/\d{1,2}/(\d{4})')
+
 def run(options):
   year_range = inspector.year_range(options)
 
   response = utils.scraper.urlopen(REPORT_SEARCH_URL, method='POST', body=POST_DATA)
-  doc = BeautifulSoup(response)
 
-  results = doc.select("div.report")
-  for result in results:
+  # The "View All" page has every report ever, so only the ones from the
+  # requested years get parsed at all
+  for source in utils.iter_elements(response, "div", {"class": "report"}):
+    match = RE_REPORT_YEAR.search(source)
+    if match and int(match.group(1)) not in year_range:
+      continue
+
+    result = utils.parse_html(source).select("div.report")[0]
     report = report_from(result, year_range)
     if report:
       inspector.save_report(report)
@@ -6,7 +6,6 @@ import os
 import re
 from urllib.parse import urljoin
 
-from bs4 import BeautifulSoup
 from utils import utils, inspector
 
 # http://www.nrc.gov/insp-gen.html
@@ -47,9 +46,9 @@ def run(options):
   year_range = inspector.year_range(options)
 
   # Pull the audit reports
-  for year in year_range:
-    url = AUDITS_REPORTS_URL.format(year)
-    doc = BeautifulSoup(utils.download(url))
+  urls = [AUDITS_REPORTS_URL.format(year) for year in year_range]
+  for url, body in zip(urls, utils.download_many(urls)):
+    doc = utils.parse_html(body)
     results = doc.find("table", border="1").select("tr")
     for index, result in enumerate(results):
       if not index:
@@ -60,7 +59,7 @@ def run(options):
         inspector.save_report(report)
 
   # Pull the congressional testimony
-  doc = BeautifulSoup(utils.download(SEMIANNUAL_REPORTS_URL))
+  doc = utils.parse_html(utils.download(SEMIANNUAL_REPORTS_URL))
   semiannual_reports_table = doc.find("table", border="1")
   for index, result in enumerate(semiannual_reports_table.select("tr")):
     if index < 2:
@@ -72,7 +71,7 @@ def run(options):
 
   # Pull the other reports
   for reports_url in OTHER_REPORT_URLS:
-    doc = BeautifulSoup(utils.download(reports_url))
+    doc = utils.parse_html(utils.download(reports_url))
     results = doc.find("table", border="1").select("tr")
     for index, result in enumerate(results):
       if not index:
@@ -142,7 +141,7 @@ def semiannual_report_from(result, year_range):
   report_link = result.find("a")
   landing_url = urljoin(BASE_REPORT_URL, report_link.get('href'))
 
-  landing_page = BeautifulSoup(utils.download(landing_url))
+  landing_page = utils.parse_html(utils.download(landing_url))
   title = " ".join(landing_page.select("#mainSubFull h1")[0].text.split())
 
   try:
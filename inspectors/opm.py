@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 
 from utils import utils, inspector
-from bs4 import BeautifulSoup
 import bs4
 import os
 import logging
@@ -35,7 +34,7 @@ def run(options):
   url = url_for()
   body = utils.download(url)
 
-  doc = BeautifulSoup(body)
+  doc = utils.parse_html(body)
   results = doc.select("section")
 
   for result in results:
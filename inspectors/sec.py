@@ -5,7 +5,6 @@ import logging
 import os
 from urllib.parse import urljoin
 
-from bs4 import BeautifulSoup
 from utils import utils, inspector
 
 # http://www.sec.gov/about/offices/oig/inspector_general_reppubs_testimony.shtml
@@ -70,7 +69,7 @@ def run(options):
   for topic in topics:
     topic_url = TOPIC_TO_URL[topic]
     body = utils.download(topic_url)
-    doc = BeautifulSoup(body)
+    doc = utils.parse_html(body)
 
     try:
       year_results = doc.select("#Listing")[0]
@@ -130,12 +129,11 @@ def report_from(result, landing_url, topic, year_range, last_published_on):
     'published_on': datetime.datetime.strftime(published_on, "%Y-%m-%d"),
   }, published_on
 
-def find_first_matching_datetime_format_from_text(text_datetime_format_tuples):
-  for text, datetime_format in text_datetime_format_tuples:
-    try:
-      return datetime.datetime.strptime(text, datetime_format)
-    except ValueError:
-      pass
+def find_first_matching_datetime_format_from_text(text_datetime_formats_tuples):
+  for text, datetime_formats in text_datetime_formats_tuples:
+    published_on = utils.parse_date(text, datetime_formats)
+    if published_on:
+      return published_on
 
 def published_date_for_report(published_on_text, title, report_url, last_published_on):
   "There are multiple different ways we try to extract the published date"
@@ -143,21 +141,20 @@ def published_date_for_report(published_on_text, title, report_url, last_publish
     return REPORT_URL_TO_PUBLISHED_DATETIMES[report_url]
 
   published_on = find_first_matching_datetime_format_from_text([
-    (published_on_text, "%b %d, %Y"),
-    (published_on_text, "%B %d, %Y"),
+    (published_on_text, ["%b %d, %Y", "%B %d, %Y"]),
 
     # Try parsing date from the end of the title
-    ("".join(title.split(",")[-2:]).strip(), "%B %d %Y"),
-    (" ".join(title.split()[-2:]), '%B %Y'),
+    ("".join(title.split(",")[-2:]).strip(), ["%B %d %Y"]),
+    (" ".join(title.split()[-2:]), ['%B %Y']),
 
     # 'April 1, 2005 to September 30, 2005 Tables'
-    (" ".join(title.rstrip(" Tables").split()[-3:]), '%B %d, %Y'),
+    (" ".join(title.rstrip(" Tables").split()[-3:]), ['%B %d, %Y']),
 
     # https://www.sec.gov/oig/reportspubs/purchasecardabuseprevention_012714.pdf
-    (os.path.splitext(report_url.split("_")[-1])[0], "%m%d%y"),
+    (os.path.splitext(report_url.split("_")[-1])[0], ["%m%d%y"]),
 
     # https://www.sec.gov/about/offices/oig/reports/reppubs/other/11-30-2012_memo-to-comm-re-postal-investigation-impact.pdf
-    (os.path.basename(report_url).split("_")[0], "%m-%d-%Y"),
+    (os.path.basename(report_url).split("_")[0], ["%m-%d-%Y"]),
   ])
   if not published_on:
     published_on = last_published_on
@@ -5,7 +5,6 @@ import logging
 import os
 from urllib.parse import urljoin
 
-from bs4 import BeautifulSoup
 from utils import utils, inspector
 
 # http://www.sigar.mil/
@@ -41,7 +40,7 @@ def run(options):
 
   # Pull the reports
   for report_url in REPORT_URLS:
-    doc = BeautifulSoup(utils.download(report_url))
+    doc = utils.parse_html(utils.download(report_url))
     results = doc.select("item")
     for result in results:
       report = report_from(result, report_url, year_range)
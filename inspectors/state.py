@@ -5,7 +5,6 @@ import logging
 import os
 import re
 
-from bs4 import BeautifulSoup
 from utils import utils, inspector
 
 # http://oig.state.gov/lbry/index.htm
@@ -143,13 +142,7 @@ def extract_reports_for_subtopic(subtopic_url, year_range, topic, subtopic=None)
     subtopic_url = subtopic_url.replace("http://http", "")
 
   body = utils.download(subtopic_url)
-  doc = BeautifulSoup(body)
-  results = doc.select("#body-row02-col02andcol03 a")
-
-  if not results:
-    results = doc.select("#body-row02-col01andcol02andcol03 a")
-  if not results and "There are currently no reports in this category" not in doc.text:
-    raise AssertionError("No report links found for %s" % subtopic_url)
+  results = utils.parse_cached(body, results_from, subtopic_url)
 
   topic_name = TOPIC_NAMES[topic]
   # Broadcasting Board of Governors is a fully independent agency
@@ -163,8 +156,43 @@ def extract_reports_for_subtopic(subtopic_url, year_range, topic, subtopic=None)
     if report:
       inspector.save_report(report)
 
+# The text around each report link that its date might be found in, so that
+# what's on a page can be cached (see utils.parse_cached)
+def results_from(body, subtopic_url):
+  doc = utils.parse_html(body)
+  links = doc.select("#body-row02-col02andcol03 a")
+
+  if not links:
+    links = doc.select("#body-row02-col01andcol02andcol03 a")
+  if not links and "There are currently no reports in this category" not in doc.text:
+    raise AssertionError("No report links found for %s" % subtopic_url)
+
+  results = []
+  for link in links:
+    try:
+      next_sibling_text = link.parent.next_sibling.text.strip()
+    except AttributeError:
+      try:
+        next_sibling_text = link.next_sibling.next_sibling.text.strip()
+      except AttributeError:
+        next_sibling_text = ""
+
+    try:
+      posted_text = link.find_parent("p").previous_sibling.previous_sibling.text
+    except AttributeError:
+      posted_text = None
+
+    results.append({
+      'title': link.text.strip(),
+      'href': link['href'],
+      'next_sibling_text': next_sibling_text,
+      'posted_text': posted_text,
+      'previous_sibling_text': str(link.previous_sibling).strip(),
+    })
+  return results
+
 def report_from(result, year_range, agency, topic, subtopic=None):
-  title = result.text.strip()
+  title = result['title']
   report_url = result['href']
 
   # Out current method of finding reports is to just look for all links within
@@ -182,31 +210,17 @@ def report_from(result, year_range, agency, topic, subtopic=None):
   report_filename = report_url.split("/")[-1]
   report_id = os.path.splitext(report_filename)[0]
 
-  try:
-    next_sibling_text = result.parent.next_sibling.text.strip()
-  except AttributeError:
-    try:
-      next_sibling_text = result.next_sibling.next_sibling.text.strip()
-    except AttributeError:
-      next_sibling_text = ""
+  published_on = None
+  for text in (result['next_sibling_text'], result['posted_text'] or ""):
+    md = re.search(r'(\w+) (\d+), (\d+)', text)
+    if md:
+      published_on = utils.parse_date("/".join(md.groups()), ['%B/%d/%Y'])
+      break
 
-  try:
-    next_sibling_text = "/".join(re.search('(\w+) (\d+), (\d+)', next_sibling_text).groups())
-    published_on = datetime.datetime.strptime(next_sibling_text, '%B/%d/%Y')
-  except AttributeError:
-    try:
-      posted_text = result.find_parent("p").previous_sibling.previous_sibling.text
-      posted_text_datetime = "/".join(re.search('(\w+) (\d+), (\d+)', posted_text).groups())
-      published_on = datetime.datetime.strptime(posted_text_datetime, '%B/%d/%Y')
-    except AttributeError:
-      try:
-        published_on = datetime.datetime.strptime("-".join(title.split()[-2:]), "%B-%y")
-      except ValueError:
-        try:
-          published_on = datetime.datetime.strptime("-".join(title.split()[-2:]), "%b-%Y")
-        except ValueError:
-          previous_sibling_text = str(result.previous_sibling).strip()
-          published_on = datetime.datetime.strptime(previous_sibling_text, "-%m/%d/%y")
+  if not published_on:
+    published_on = utils.parse_date("-".join(title.split()[-2:]), ["%B-%y", "%b-%Y"])
+  if not published_on:
+    published_on = datetime.datetime.strptime(result['previous_sibling_text'], "-%m/%d/%y")
 
   if published_on.year not in year_range:
     logging.debug("[%s] Skipping, not in requested range." % report_url)
@@ -278,30 +292,25 @@ def get_page_highlights(page_url):
     'BBG Inspections': 'http://oig.state.gov/lbry/archives/bbg/isp/index.htm'
   }
   """
-  body = utils.download(page_url)
-  doc = BeautifulSoup(body)
+  doc = utils.beautifulsoup_from_url(page_url)
 
   # Each page on the site is given an id that is used to find the highlights
   page_id = re.search("item_id = '(\d+)';", doc.find(language='javascript').text).groups()[0]
 
   # The first hightlights page just gives a link to the real page
-  first_highlights = beautifulsoup_from_url("http://oig.state.gov/highlights_xml/c_%s.xml" % page_id)
+  first_highlights = utils.beautifulsoup_from_url("http://oig.state.gov/highlights_xml/c_%s.xml" % page_id)
   highlights_url = first_highlights.find("highlightpath")
 
   # If we can't find the highlights from the highlights_xml, fall back to learnmore_xml
   if not highlights_url:
-    first_highlights = beautifulsoup_from_url("http://oig.state.gov/learnmore_xml/c_%s.xml" % page_id)
+    first_highlights = utils.beautifulsoup_from_url("http://oig.state.gov/learnmore_xml/c_%s.xml" % page_id)
     highlights_url = first_highlights.find("highlightpath")
 
-  highlights = beautifulsoup_from_url("http://oig.state.gov%s" % highlights_url.text)
+  highlights = utils.beautifulsoup_from_url("http://oig.state.gov%s" % highlights_url.text)
   return {
     link.text.replace(u'•', '').strip(): link['href']
     for link
     in highlights.select("a")
   }
 
-def beautifulsoup_from_url(url):
-  body = utils.download(url)
-  return BeautifulSoup(body)
-
 utils.run(run) if (__name__ == "__main__") else None
@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 
 from utils import utils, inspector
-from bs4 import BeautifulSoup
 from datetime import datetime
 import logging
 
@@ -45,7 +44,7 @@ def run(options):
     logging.debug("## Downloading page %i" % page)
     url = url_for(options, page)
     body = utils.download(url)
-    doc = BeautifulSoup(body)
+    doc = utils.parse_html(body)
 
     # When the USPS restores their page controls, we can use this again,
     # which saves one network call each time.
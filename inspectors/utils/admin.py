@@ -19,7 +19,9 @@ else:
     config = None
 
 
-def notify(body):
+# name is the scraper the message is about, if any. it's added to the email,
+# since log lines are already tagged with it (see utils.configure_logging).
+def notify(body, name=None):
     try:
         if isinstance(body, Exception):
             body = format_exception(body)
@@ -29,6 +31,8 @@ def notify(body):
         if config:
             details = config.get('email')
             if details:
+                if name:
+                    body = "[%s] %s" % (name, body)
                 send_email(body)
 
     except Exception as exception:
@@ -0,0 +1,92 @@
+# a content-addressed store for downloaded files, so that a file saved under
+# several reports (e.g. the same PDF linked from two listings, or under two
+# report IDs) only takes up disk space once.
+#
+# each distinct file is kept once, named by its sha256:
+#
+#   data/.blobs/3f/3f2a...e1
+#
+# and every report path holding that file (data/<ig>/<year>/<report_id>/
+# report.pdf, as before) is a hardlink to it, so the usual layout stays
+# readable by anything that reads it now. output derived from a file, like its
+# extracted text, can be kept alongside it (3f2a...e1.txt) and linked the
+# same way.
+#
+# files are only ever replaced (with os.replace, see files.py), never
+# rewritten in place, so changing one report's copy never changes the
+# others'. that goes for anything writing to a report's path, including
+# text extraction. where hardlinks aren't possible, files are simply left as
+# independent copies.
+
+import hashlib
+import logging
+import os
+
+from . import files
+
+CHUNK_SIZE = 64 * 1024
+
+
+class BlobStore(object):
+  def __init__(self, directory):
+    self.directory = directory
+
+  def path_for(self, sha256, ext=None):
+    name = sha256 if not ext else "%s.%s" % (sha256, ext)
+    return os.path.join(self.directory, sha256[:2], name)
+
+  # files with more than one link to them are already in the store
+  def contains(self, path):
+    return os.stat(path).st_nlink > 1
+
+  # moves a file into the store (unless an identical one is there already),
+  # and leaves a link to the stored copy in its place. returns its sha256.
+  #
+  # with replace, the file takes the place of what's stored instead, e.g.
+  # text extracted again from the same file. paths already linked to the old
+  # copy keep it.
+  def add(self, path, sha256=None, ext=None, replace=False):
+    if sha256 is None:
+      sha256 = digest(path)
+    blob_path = self.path_for(sha256, ext)
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+
+    if replace and os.path.exists(blob_path):
+      if not self.link(path, blob_path):
+        logging.debug("## \tnot stored, can't replace %s" % blob_path)
+      return sha256
+
+    try:
+      os.link(path, blob_path)
+      logging.debug("## \tstored as %s" % blob_path)
+    except FileExistsError:
+      self.link(blob_path, path)
+    except OSError as e:
+      logging.debug("## \tnot stored, can't link %s: %s" % (path, e))
+
+    return sha256
+
+  # puts a link to a stored file at path, replacing whatever was there.
+  # returns whether it worked.
+  def link(self, blob_path, path):
+    if os.path.exists(path) and os.path.samefile(blob_path, path):
+      return True
+
+    temp_path = files.temp_path_for(path)
+    try:
+      os.link(blob_path, temp_path)
+    except OSError as e:
+      logging.debug("## \tcan't link %s: %s" % (blob_path, e))
+      return False
+
+    os.replace(temp_path, path)
+    logging.debug("## \tduplicate of %s" % blob_path)
+    return True
+
+
+def digest(path):
+  sha256 = hashlib.sha256()
+  with open(path, "rb") as f:
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+      sha256.update(chunk)
+  return sha256.hexdigest()
@@ -0,0 +1,127 @@
+# parses dates that a site writes in more than one way, e.g.
+#
+#   utils.parse_date("March 2014", ["%m-%d-%Y", "%B %d, %Y", "%B %Y"])
+#
+# returns the datetime for the first format that fits the whole text, just
+# like trying datetime.strptime with each format in turn, or None if none of
+# them do.
+#
+# each list of formats is compiled once into a single regex, so that the
+# right format is found in one pass instead of by raising and catching a
+# ValueError for every one that doesn't fit. strptime is then only called
+# with that one. the regex is a little looser than strptime (e.g. any two
+# digits for a day, any word for a month), so that it never misses a format
+# strptime would take; if strptime turns down the one it picked, the later
+# formats are tried one by one as usual. formats with directives that aren't
+# in DIRECTIVES are always tried one by one.
+#
+# results are remembered for each text and list of formats, and every call
+# counts which format it matched (or that none did), so that a scraper's
+# fallbacks can be seen to be used, or not, when the run is over.
+
+import collections
+import datetime
+import re
+import threading
+
+from . import memo
+
+# what each directive can match, or more
+DIRECTIVES = {
+  'd': r"\s?\d{1,2}",
+  'm': r"\s?\d{1,2}",
+  'H': r"\d{1,2}",
+  'I': r"\d{1,2}",
+  'M': r"\d{1,2}",
+  'S': r"\d{1,2}",
+  'y': r"\d\d",
+  'Y': r"\d\d\d\d",
+  'b': r"[^\W\d_]+",
+  'B': r"[^\W\d_]+",
+  'a': r"[^\W\d_]+",
+  'A': r"[^\W\d_]+",
+  'p': r"[^\W\d_]+",
+  'Z': r"[^\W\d_]+",
+  '%': r"%",
+}
+
+DIRECTIVE_RE = re.compile(r"%(.)|(\s+)|([^%\s]+)", re.DOTALL)
+
+
+class DateParser(object):
+  def __init__(self, size):
+    self.formats = {}
+    self.memo = memo.Memo("dates", size)
+    self.matched = collections.Counter()
+    self.lock = threading.Lock()
+
+  def parse(self, text, formats):
+    formats = tuple(formats)
+    key = (text, formats)
+    found = self.memo.get(key)
+    if found is None:
+      found = self.compiled(formats).parse(text)
+      self.memo.put(key, found)
+
+    with self.lock:
+      self.matched[found[1]] += 1
+    return found[0]
+
+  def compiled(self, formats):
+    compiled = self.formats.get(formats)
+    if compiled is None:
+      compiled = self.formats[formats] = DateFormats(formats)
+    return compiled
+
+  def clear(self):
+    self.memo.clear()
+    with self.lock:
+      self.matched.clear()
+
+  def summary(self):
+    with self.lock:
+      counts = ["%s %i" % (format or "none", count) for format, count in self.matched.most_common()]
+    return "%s; %s" % (self.memo.summary(), ", ".join(counts) or "none parsed")
+
+
+class DateFormats(object):
+  def __init__(self, formats):
+    self.formats = formats
+
+    # each format's pattern is wrapped in a group of its own, and the group
+    # of whichever format matched is the last one closed
+    try:
+      patterns = ["(%s)" % pattern_for(format) for format in formats]
+    except KeyError:
+      self.regex = None
+    else:
+      self.regex = re.compile(r"(?:%s)\Z" % "|".join(patterns), re.IGNORECASE)
+
+  # returns (datetime, format), or (None, None)
+  def parse(self, text):
+    first = 0
+    if self.regex:
+      match = self.regex.match(text)
+      if not match:
+        return (None, None)
+      first = match.lastindex - 1
+
+    for format in self.formats[first:]:
+      try:
+        return (datetime.datetime.strptime(text, format), format)
+      except ValueError:
+        pass
+    return (None, None)
+
+
+# like strptime, whitespace in a format matches any amount of whitespace
+def pattern_for(format):
+  pattern = []
+  for directive, space, literal in DIRECTIVE_RE.findall(format):
+    if directive:
+      pattern.append(DIRECTIVES[directive])
+    elif space:
+      pattern.append(r"\s+")
+    else:
+      pattern.append(re.escape(literal))
+  return "".join(pattern)
@@ -0,0 +1,36 @@
+# files are written to a temporary path first, and only moved into place
+# (with os.replace) once they're complete, so that a crash can't leave a
+# truncated file behind, and nothing reading the file ever sees half of it.
+# it also means a file is never rewritten in place, which matters for files
+# that are hardlinked from more than one path (see blobs.py).
+
+import os
+import threading
+
+
+# unique per process and thread, so concurrent writers never collide
+def temp_path_for(path):
+  return "%s.%i-%i.tmp" % (path, os.getpid(), threading.get_ident())
+
+# text is written as UTF-8, bytes as they are
+def write(content, path):
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+
+  temp_path = temp_path_for(path)
+  try:
+    if isinstance(content, bytes):
+      f = open(temp_path, "wb")
+    else:
+      f = open(temp_path, "w", encoding="utf-8")
+    with f:
+      f.write(content)
+  except BaseException:
+    discard(temp_path)
+    raise
+  os.replace(temp_path, path)
+
+def discard(path):
+  try:
+    os.remove(path)
+  except FileNotFoundError:
+    pass
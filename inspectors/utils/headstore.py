@@ -0,0 +1,65 @@
+# an on-disk record of what a server last said about each downloaded file:
+# its ETag, Last-Modified date, length and type, and when that was checked.
+#
+# report files are downloaded once and then kept, so this is what tells
+# whether the copy on disk is still the server's current version (see
+# --revalidate in utils.download), without downloading it all over again.
+
+import hashlib
+import json
+import os
+import time
+
+from . import files
+
+
+class HeadStore(object):
+  def __init__(self, directory):
+    self.directory = directory
+
+  def path_for(self, url):
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(self.directory, key[:2], "%s.json" % key)
+
+  # returns what was recorded for the URL, or None
+  def get(self, url):
+    try:
+      with open(self.path_for(url)) as f:
+        return json.load(f)
+    except (IOError, ValueError):
+      return None
+
+  # records a response's headers. content_length can be given when it isn't
+  # the header's, e.g. for a download that was resumed part way through.
+  def put(self, url, headers, content_length=None):
+    record = record_for(url, headers, content_length)
+    self.save(record)
+    return record
+
+  def save(self, record):
+    files.write(json.dumps(record, sort_keys=True, indent=2), self.path_for(record['url']))
+
+
+# the record of a response's headers, without saving it
+def record_for(url, headers, content_length=None):
+  if content_length is None:
+    content_length = headers.get('Content-Length')
+
+  return {
+    'url': url,
+    'etag': headers.get('ETag'),
+    'last_modified': headers.get('Last-Modified'),
+    'content_length': int(content_length) if content_length else None,
+    'content_type': headers.get('Content-Type'),
+    'checked': time.time(),
+  }
+
+
+# whether two records are of different versions of a file. the ETag is the
+# best evidence, then Last-Modified, then the length; whatever's missing from
+# either record doesn't count either way.
+def changed(old, new):
+  for field in ('etag', 'last_modified', 'content_length'):
+    if old.get(field) and new.get(field):
+      return old[field] != new[field]
+  return False
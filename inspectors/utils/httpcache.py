@@ -0,0 +1,104 @@
+# an on-disk cache of downloaded pages, keyed by URL.
+#
+# alongside each page it keeps the ETag and Last-Modified headers the server
+# sent with it, so that the page can be asked for again conditionally
+# (with If-None-Match and If-Modified-Since). when the server answers
+# "304 Not Modified", the copy on disk is used instead.
+#
+# pages can also be used without asking the server at all, for a while after
+# they were fetched. how long depends on the URL, and the cache's total size is
+# capped, by throwing out the least recently used pages first. in admin.yml:
+#
+#   http_cache:
+#     max_size: 1024       # megabytes
+#     default_ttl: 0       # seconds
+#     ttl:                 # first matching pattern (a regex) wins
+#       - pattern: "/reports-and-publications/.*index\.asp$"
+#         seconds: 3600
+#       - pattern: "report_summary\.cfm"
+#         seconds: 604800
+
+import hashlib
+import json
+import os
+import re
+import time
+
+from . import files, sizecap
+
+DEFAULT_MAX_SIZE = 1024  # megabytes
+DEFAULT_TTL = 0  # seconds
+
+
+class HttpCache(object):
+  def __init__(self, directory, config=None):
+    config = {} if not config else config
+    self.directory = directory
+    self.default_ttl = int(config.get('default_ttl', DEFAULT_TTL))
+    self.ttls = [(re.compile(rule['pattern']), int(rule['seconds'])) for rule in (config.get('ttl') or [])]
+
+    # the bodies count towards the size, and are thrown out with their headers
+    self.cap = sizecap.SizeCap(directory, config.get('max_size', DEFAULT_MAX_SIZE), ".body", (".json",), "pages from the HTTP cache")
+
+  # each URL gets a .json file for its headers and a .body file for its text
+  def paths_for(self, url):
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    base = os.path.join(self.directory, key[:2], key)
+    return ("%s.json" % base, "%s.body" % base)
+
+  # returns a (metadata, body) tuple, or None if the URL isn't cached
+  def get(self, url):
+    meta_path, body_path = self.paths_for(url)
+    try:
+      with open(meta_path) as f:
+        meta = json.load(f)
+      with open(body_path, encoding="utf-8") as f:
+        body = f.read()
+    except (IOError, ValueError):
+      return None
+
+    self.cap.touch(body_path)
+    return (meta, body)
+
+  def put(self, url, headers, body):
+    meta_path, body_path = self.paths_for(url)
+    meta = {
+      'url': url,
+      'etag': headers.get('ETag'),
+      'last_modified': headers.get('Last-Modified'),
+      'fetched': time.time(),
+    }
+
+    previous_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+
+    # the body goes first, so that metadata never points at a missing body
+    files.write(body, body_path)
+    files.write(json.dumps(meta, sort_keys=True, indent=2), meta_path)
+
+    self.cap.grew(os.path.getsize(body_path) - previous_size)
+
+  # the server said a page hasn't changed, so it's as good as freshly fetched
+  def refresh(self, meta):
+    meta_path, body_path = self.paths_for(meta['url'])
+    meta = dict(meta, fetched=time.time())
+    files.write(json.dumps(meta, sort_keys=True, indent=2), meta_path)
+
+  # whether a page can be used without asking the server about it
+  def is_fresh(self, meta):
+    age = time.time() - meta.get('fetched', 0)
+    return age < self.ttl_for(meta['url'])
+
+  def ttl_for(self, url):
+    for pattern, seconds in self.ttls:
+      if pattern.search(url):
+        return seconds
+    return self.default_ttl
+
+  # headers for asking whether a cached page has changed
+  def conditional_headers(self, meta):
+    headers = {}
+    if meta.get('etag'):
+      headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+      headers['If-Modified-Since'] = meta['last_modified']
+    return headers
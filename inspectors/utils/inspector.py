@@ -1,6 +1,8 @@
-from utils import utils
+from utils import utils, blobs, files
+from utils.pipeline import Pipeline
 import os
 import re
+import json
 import logging
 import datetime
 import urllib.parse
@@ -8,11 +10,26 @@ import urllib.parse
 # Save a report to disk, provide output along the way.
 #
 # 1) download report to disk
-# 2) extract text from downloaded report using report['file_type']
+# 2) extract text from downloaded report using report['file_type'],
+#    unless it was already extracted on an earlier run (see is_extracted)
 # 3) write report metadata to disk
 #
 # fields used: file_type, url, inspector, year, report_id
 # fields added: report_path, text_path
+#
+# With --offline, reports that aren't already on disk are not downloaded,
+# and only their metadata is written (see utils.offline).
+#
+# With --pipeline, steps 1-3 happen in the background instead, so that the
+# scraper can move on to its next report right away. Use --download_workers
+# and --extract_workers to set how many reports are downloaded and extracted
+# at once (default 4 and 2). Giving --extract_workers turns on the pipeline
+# too, and has each report extracted in a process of its own (see
+# utils.extract).
+#
+# With --revalidate (and without the pipeline), reports that were downloaded
+# before are saved in batches, so that the servers can be asked whether they
+# have changed several at a time (see utils.revalidate_many).
 
 def save_report(report):
   options = utils.options()
@@ -33,6 +50,14 @@ def save_report(report):
     logging.warn('\tdry run: skipping download and extraction')
   elif report.get('unreleased', False) is True:
     logging.warn('\tno download/extraction of unreleased report')
+  elif options.get('offline') and not is_downloaded(report):
+    logging.warn('\toffline: report was never downloaded, skipping download and extraction')
+  elif options.get('pipeline') or options.get('extract_workers'):
+    report_pipeline().put(report)
+    return True
+  elif options.get('revalidate') and is_downloaded(report):
+    batch_revalidation(report)
+    return True
   else:
     report_path = download_report(report)
     if not report_path:
@@ -41,12 +66,9 @@ def save_report(report):
 
     logging.warn("\treport: %s" % report_path)
 
-    metadata = extract_metadata(report)
-    if metadata:
-      for key, value in metadata.items():
-        logging.debug("\t%s: %s" % (key, value))
-
     text_path = extract_report(report)
+    for key, value in report.get('pdf', {}).items():
+      logging.debug("\t%s: %s" % (key, value))
     logging.warn("\ttext: %s" % text_path)
 
   data_path = write_report(report)
@@ -55,6 +77,76 @@ def save_report(report):
   return True
 
 
+# Background versions of the steps in save_report. Output from several
+# reports is interleaved, so each line is tagged with the report it's about.
+
+def pipelined_download(report):
+  report_path = download_report(report)
+  if not report_path:
+    logging.warn("[%s] error downloading report: sadly, skipping." % report['report_id'])
+    return None
+
+  logging.warn("[%s] report: %s" % (report['report_id'], report_path))
+  return report
+
+def pipelined_extract(report):
+  text_path = extract_report(report)
+  for key, value in report.get('pdf', {}).items():
+    logging.debug("[%s] %s: %s" % (report['report_id'], key, value))
+  logging.warn("[%s] text: %s" % (report['report_id'], text_path))
+  return report
+
+def pipelined_write(report):
+  data_path = write_report(report)
+  logging.warn("[%s] data: %s" % (report['report_id'], data_path))
+
+# started on first use, and drained when the scraper finishes
+pipeline = None
+
+def report_pipeline():
+  global pipeline
+  if pipeline is None:
+    options = utils.options()
+    pipeline = Pipeline([
+      ("download", pipelined_download, utils.download_workers()),
+      ("extract", pipelined_extract, int(options.get('extract_workers', 2))),
+      ("write", pipelined_write, 1),
+    ])
+    utils.finishers.append(finish_pipeline)
+  return pipeline
+
+def finish_pipeline():
+  global pipeline
+  pipeline.join()
+  pipeline = None
+
+# reports waiting to be revalidated together, saved once there are enough of
+# them, and when the scraper finishes
+revalidation_batch = []
+
+def batch_revalidation(report):
+  if not revalidation_batch:
+    utils.finishers.append(flush_revalidation)
+  revalidation_batch.append(report)
+  if len(revalidation_batch) >= (utils.download_workers() * 4):
+    flush_revalidation()
+
+def flush_revalidation():
+  batch = revalidation_batch[:]
+  del revalidation_batch[:]
+  if not batch:
+    return
+
+  utils.revalidate_many(
+    [report['url'] for report in batch],
+    [os.path.join(utils.data_dir(), path_for(report, report['file_type'])) for report in batch]
+  )
+  for report in batch:
+    if pipelined_download(report):
+      pipelined_extract(report)
+      pipelined_write(report)
+
+
 # Preprocess before validation, to catch cases where inference didn't work.
 # So, fields may be absent at this time.
 def preprocess_report(report):
@@ -137,6 +229,9 @@ def validate_report(report):
   return True
 
 
+def is_downloaded(report):
+  return os.path.exists(os.path.join(utils.data_dir(), path_for(report, report['file_type'])))
+
 def download_report(report):
   report_path = path_for(report, report['file_type'])
   binary = (report['file_type'].lower() == 'pdf')
@@ -153,35 +248,130 @@ def download_report(report):
 
 FILE_EXTENSIONS_HTML = ("htm", "html", "cfm", "php", "asp", "aspx")
 
-def extract_metadata(report):
+# relies on putting text next to report_path.
+# for PDFs, also adds the PDF's metadata to the report as 'pdf'.
+def extract_report(report):
   report_path = path_for(report, report['file_type'])
-  real_report_path = os.path.join(utils.data_dir(), report_path)
 
   file_type_lower = report['file_type'].lower()
   if file_type_lower == "pdf":
-    metadata = utils.metadata_from_pdf(report_path)
+    metadata, text_path = extract_pdf(report)
     if metadata:
       report['pdf'] = metadata
-      return metadata
+    return text_path
   elif file_type_lower in FILE_EXTENSIONS_HTML:
-    return None
-  else:
-    logging.warn("Unknown file type, don't know how to extract metadata!")
-    return None
+    if is_extracted(report, "txt"):
+      return path_for(report, "txt")
 
-# relies on putting text next to report_path
-def extract_report(report):
-  report_path = path_for(report, report['file_type'])
+    sha256 = report_digest(report)
+    shared = shared_extraction(report, sha256)
+    if shared:
+      return shared[1]
 
-  file_type_lower = report['file_type'].lower()
-  if file_type_lower == "pdf":
-    return utils.text_from_pdf(report_path)
-  elif file_type_lower in FILE_EXTENSIONS_HTML:
-    return utils.text_from_html(report_path)
+    text_path = utils.extract(utils.text_from_html, report_path)
+    share_extraction(report, sha256, None, text_path)
+    return text_path
   else:
     logging.warn("Unknown file type, don't know how to extract text!")
     return None
 
+# text and metadata come from the same pass over the PDF (see
+# utils.process_pdf), so they're reused or redone together. a report JSON
+# without metadata (e.g. written by --dry_run, or when pdfinfo failed) means
+# there's nothing to reuse, however new it is.
+def extract_pdf(report):
+  if is_extracted(report, "txt") and is_extracted(report, "json"):
+    metadata = previous_report(report).get('pdf')
+    if metadata:
+      return metadata, path_for(report, "txt")
+
+  sha256 = report_digest(report)
+  shared = shared_extraction(report, sha256)
+  if shared and shared[0]:
+    return shared
+
+  # a timed out extraction gives back nothing at all
+  result = utils.extract(utils.process_pdf, path_for(report, report['file_type']))
+  metadata, text_path = result or (None, None)
+  share_extraction(report, sha256, metadata, text_path)
+  return metadata, text_path
+
+# With --dedupe, reports that are the same file (see utils/blobs.py) are only
+# extracted once: the first one's text and PDF metadata are kept in the blob
+# store, and later ones get a link to the text and a copy of the metadata.
+def report_digest(report):
+  if not utils.dedupe():
+    return None
+  return blobs.digest(os.path.join(utils.data_dir(), path_for(report, report['file_type'])))
+
+# With --force_extract, each file is extracted again once, and what it gives
+# replaces what was kept.
+reextracted = set()
+
+def shared_extraction(report, sha256):
+  if not sha256:
+    return None
+  if force_extract() and (sha256 not in reextracted):
+    return None
+
+  store = utils.blob_store()
+  text_blob = store.path_for(sha256, "txt")
+  if not os.path.exists(text_blob):
+    return None
+
+  text_path = path_for(report, "txt")
+  if not store.link(text_blob, os.path.join(utils.data_dir(), text_path)):
+    return None
+
+  metadata = None
+  metadata_blob = store.path_for(sha256, "json")
+  if os.path.exists(metadata_blob):
+    with open(metadata_blob) as f:
+      metadata = json.load(f)
+
+  logging.debug("\treusing text extracted from the same file: %s" % text_blob)
+  return metadata, text_path
+
+def share_extraction(report, sha256, metadata, text_path):
+  if (not sha256) or (not text_path):
+    return
+
+  # metadata first, since the text is what says there's something to reuse
+  store = utils.blob_store()
+  metadata_blob = store.path_for(sha256, "json")
+  if metadata:
+    utils.write(utils.json_for(metadata), metadata_blob)
+  else:
+    files.discard(metadata_blob)
+  store.add(os.path.join(utils.data_dir(), text_path), sha256, "txt", replace=force_extract())
+  if force_extract():
+    reextracted.add(sha256)
+
+# Whether output extracted from a report on an earlier run (its text, or the
+# metadata in its JSON) is still good, i.e. is newer than the report file.
+# Use --force_extract to always extract again.
+def is_extracted(report, ext):
+  if force_extract():
+    return False
+
+  report_path = os.path.join(utils.data_dir(), path_for(report, report['file_type']))
+  output_path = os.path.join(utils.data_dir(), path_for(report, ext))
+  if not os.path.exists(output_path):
+    return False
+  return os.path.getmtime(output_path) >= os.path.getmtime(report_path)
+
+def force_extract():
+  return bool(utils.options().get('force_extract'))
+
+# the report's JSON as written on an earlier run
+def previous_report(report):
+  data_path = os.path.join(utils.data_dir(), path_for(report, "json"))
+  try:
+    with open(data_path) as f:
+      return json.load(f)
+  except ValueError:
+    return {}
+
 def write_report(report):
   data_path = path_for(report, "json")
 
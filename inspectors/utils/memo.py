@@ -0,0 +1,60 @@
+# an in-memory, least-recently-used memo, for things that are looked up
+# more than once during a single run (e.g. listing pages that a scraper
+# downloads once to find its pagination links, and again to read reports).
+#
+# it holds at most `size` items, and counts its hits and misses so that
+# they can be reported when the run is over. with max_weight, it also holds
+# no more than that much in all, going by the weight each item is put with
+# (e.g. a page's length), and doesn't hold items heavier than that at all.
+
+import collections
+import threading
+
+
+class Memo(object):
+  def __init__(self, name, size, max_weight=None):
+    self.name = name
+    self.size = size
+    self.max_weight = max_weight
+    self.weight = 0
+    self.items = collections.OrderedDict()
+    self.lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+  # returns the remembered value, or None
+  def get(self, key):
+    with self.lock:
+      if key in self.items:
+        self.items.move_to_end(key)
+        self.hits += 1
+        return self.items[key][0]
+      else:
+        self.misses += 1
+        return None
+
+  def put(self, key, value, weight=0):
+    if value is None:
+      return
+    if (self.max_weight is not None) and (weight > self.max_weight):
+      return
+
+    with self.lock:
+      if key in self.items:
+        self.weight -= self.items[key][1]
+      self.items[key] = (value, weight)
+      self.items.move_to_end(key)
+      self.weight += weight
+      while (len(self.items) > self.size) or ((self.max_weight is not None) and (self.weight > self.max_weight)):
+        old_value, old_weight = self.items.popitem(last=False)[1]
+        self.weight -= old_weight
+
+  def clear(self):
+    with self.lock:
+      self.items.clear()
+      self.weight = 0
+      self.hits = 0
+      self.misses = 0
+
+  def summary(self):
+    return "%s: %i hits, %i misses" % (self.name, self.hits, self.misses)
@@ -0,0 +1,75 @@
+# a small pipeline of worker threads, for moving slow work out of a
+# scraper's main loop.
+#
+# each stage is a (name, function, workers) tuple. every stage reads from its
+# own bounded queue, and whatever its function returns (unless None) is passed
+# on to the next stage. since the queues are bounded, a scraper that finds
+# reports faster than they can be processed blocks on put() rather than
+# piling them up in memory.
+
+import logging
+import queue
+import threading
+
+from . import admin
+
+# put on a queue once per worker, to tell it to stop
+STOP = object()
+
+
+class Pipeline(object):
+  def __init__(self, stages, queue_size=10):
+    self.queues = [queue.Queue(maxsize=queue_size) for stage in stages]
+    self.threads = []
+
+    for index, (name, function, workers) in enumerate(stages):
+      for number in range(workers):
+        thread = threading.Thread(
+          target=self.work, args=(index, function),
+          name="%s-%i" % (name, number)
+        )
+        thread.daemon = True
+        thread.start()
+        self.threads.append((index, thread))
+
+  # hand an item to the first stage, blocking while that stage is backed up
+  def put(self, item):
+    self.queues[0].put(item)
+
+  def work(self, index, function):
+    inbox = self.queues[index]
+    if index + 1 < len(self.queues):
+      outbox = self.queues[index + 1]
+    else:
+      outbox = None
+
+    while True:
+      item = inbox.get()
+      try:
+        if item is STOP:
+          return
+
+        result = function(item)
+        if (result is not None) and (outbox is not None):
+          outbox.put(result)
+
+      # one bad item shouldn't take a whole stage down with it
+      except Exception as exception:
+        admin.notify(exception)
+
+      finally:
+        inbox.task_done()
+
+  # wait for everything put so far to make it all the way through,
+  # then shut down the workers
+  def join(self):
+    # stages are drained in order, since each one feeds the next
+    for inbox in self.queues:
+      inbox.join()
+
+    for index, thread in self.threads:
+      self.queues[index].put(STOP)
+    for index, thread in self.threads:
+      thread.join()
+
+    logging.debug("## Pipeline finished")
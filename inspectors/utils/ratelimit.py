@@ -0,0 +1,140 @@
+# per-host rate limiting for outgoing requests
+#
+# every host gets its own token bucket, so a slow crawl of one agency's site
+# doesn't use up the budget for requests to every other agency. hosts shared
+# by several scrapers (e.g. www.treasury.gov, for tigta and treasury) still
+# share a single bucket, since buckets are keyed by host and not by scraper.
+#
+# rates are in requests per minute, and can be changed in admin.yml:
+#
+#   rate_limits:
+#     default: 120
+#     burst: 1
+#     shared: false
+#     hosts:
+#       www.treasury.gov: 60
+#
+# by default buckets live in memory, which only protects a host from a single
+# process. with `shared: true` (or when ./igs runs scrapers in parallel) the
+# buckets live in lock files under the cache directory instead, so that every
+# process on the machine draws from the same per-host budget.
+
+import fcntl
+import logging
+import os
+import threading
+import time
+import urllib.parse
+
+DEFAULT_REQUESTS_PER_MINUTE = 120
+DEFAULT_BURST = 1
+
+
+class TokenBucket(object):
+  def __init__(self, requests_per_minute, burst=DEFAULT_BURST):
+    self.rate = requests_per_minute / 60.0
+    self.capacity = burst
+    self.tokens = burst
+    self.last = time.time()
+    self.lock = threading.Lock()
+
+  # takes a token, returning how many seconds to wait before using it.
+  def reserve(self):
+    with self.lock:
+      now = time.time()
+      self.tokens, delay = self.take(self.tokens, self.last, now)
+      self.last = now
+      return delay
+
+  # refills a bucket left at `tokens` at time `last`, and takes one token out.
+  # the bucket is allowed to go negative, which reserves a slot in the
+  # future, so that concurrent callers get spaced out instead of all
+  # waking up at the same moment.
+  def take(self, tokens, last, now):
+    tokens = min(self.capacity, tokens + ((now - last) * self.rate)) - 1
+    if tokens >= 0:
+      return tokens, 0
+    return tokens, -tokens / self.rate
+
+
+class SharedTokenBucket(TokenBucket):
+  def __init__(self, path, requests_per_minute, burst=DEFAULT_BURST):
+    super(SharedTokenBucket, self).__init__(requests_per_minute, burst)
+    self.path = path
+
+  # same as TokenBucket, but the bucket's state is kept in a file, and
+  # every process takes an exclusive lock on it while taking a token
+  def reserve(self):
+    with self.lock:
+      with open(self.path, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+
+        now = time.time()
+        f.seek(0)
+        state = f.read().split()
+        if len(state) == 2:
+          tokens, last = float(state[0]), float(state[1])
+        else:
+          tokens, last = self.capacity, now
+
+        tokens, delay = self.take(tokens, last, now)
+
+        f.seek(0)
+        f.truncate()
+        f.write("%f %f" % (tokens, now))
+        f.flush()
+
+      # closing the file releases the lock
+      return delay
+
+
+class HostRateLimiter(object):
+  def __init__(self, config=None):
+    config = {} if not config else config
+    self.default = config.get('default', DEFAULT_REQUESTS_PER_MINUTE)
+    self.burst = config.get('burst', DEFAULT_BURST)
+    self.hosts = config.get('hosts') or {}
+
+    self.buckets = {}
+    self.lock = threading.Lock()
+
+    self.shared = bool(config.get('shared'))
+    self.shared_dir = None
+
+  # switch to buckets that are shared with other processes, through
+  # lock files kept in the given directory
+  def share(self, directory):
+    os.makedirs(directory, exist_ok=True)
+
+    with self.lock:
+      self.shared_dir = directory
+      self.buckets = {}
+
+  # 0 (or nothing) means the host isn't throttled at all
+  def requests_per_minute(self, host):
+    return self.hosts.get(host, self.default)
+
+  def bucket_for(self, host):
+    with self.lock:
+      if host not in self.buckets:
+        if self.shared_dir:
+          path = os.path.join(self.shared_dir, host)
+          self.buckets[host] = SharedTokenBucket(path, self.requests_per_minute(host), self.burst)
+        else:
+          self.buckets[host] = TokenBucket(self.requests_per_minute(host), self.burst)
+      return self.buckets[host]
+
+  # blocks until a request to this URL's host is allowed
+  def wait(self, url):
+    host = host_for(url)
+    if not self.requests_per_minute(host):
+      return
+
+    delay = self.bucket_for(host).reserve()
+    if delay > 0:
+      logging.debug("## Throttling %s for %.2fs" % (host, delay))
+      time.sleep(delay)
+
+
+def host_for(url):
+  return (urllib.parse.urlparse(url).hostname or "").lower()
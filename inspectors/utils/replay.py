@@ -0,0 +1,109 @@
+# an archive of HTTP requests and their responses, for running scrapers
+# against a frozen copy of the sites they scrape.
+#
+#   ./inspectors/hhs.py --since=2010 --record=archives/hhs
+#   ./inspectors/hhs.py --since=2010 --replay=archives/hhs
+#
+# with --record, every request that the scraper makes (including POSTs and
+# HEADs) is saved along with the response it got, errors included. with
+# --replay, those responses are handed back instead, without any network
+# access or rate limiting, so that parsing runs at full speed and fails the
+# same way every time. a request that isn't in the archive raises NotArchived.
+#
+# requests are matched by method, URL and body. conditional and range
+# headers aren't sent while recording, so that every recorded response is
+# complete and can answer the same request made without them.
+
+import hashlib
+import io
+import json
+import logging
+import os
+import urllib.parse
+
+import requests
+
+from . import files
+
+# headers that would make the server send something other than the whole page
+SKIPPED_REQUEST_HEADERS = ('If-None-Match', 'If-Modified-Since', 'Range', 'If-Range')
+
+# bodies are saved decoded, so these no longer describe them
+SKIPPED_RESPONSE_HEADERS = ('Content-Encoding', 'Transfer-Encoding')
+
+
+class NotArchived(Exception):
+  pass
+
+
+class Archive(object):
+  def __init__(self, directory, replaying=False):
+    self.directory = directory
+    self.replaying = replaying
+
+  def paths_for(self, method, url, data=None):
+    key = hashlib.sha1()
+    key.update(("%s %s\n" % (method.upper(), url)).encode("utf-8"))
+    key.update(body_bytes(data))
+    key = key.hexdigest()
+    base = os.path.join(self.directory, key[:2], key)
+    return ("%s.json" % base, "%s.body" % base)
+
+  # request headers, minus any that shouldn't be sent while recording
+  def headers_for(self, headers):
+    headers = dict(headers or {})
+    for header in SKIPPED_REQUEST_HEADERS:
+      headers.pop(header, None)
+    return headers
+
+  def record(self, method, url, data, response):
+    meta_path, body_path = self.paths_for(method, url, data)
+    meta = {
+      'method': method.upper(),
+      'url': url,
+      'final_url': response.url,
+      'status': response.status_code,
+      'reason': response.reason,
+      'headers': dict((key, value) for key, value in response.headers.items() if key not in SKIPPED_RESPONSE_HEADERS),
+    }
+
+    # reads the whole body in, though the response can still be iterated
+    # over afterwards by whoever asked for it
+    files.write(response.content, body_path)
+    files.write(json.dumps(meta, sort_keys=True, indent=2), meta_path)
+    logging.debug("## \trecorded as %s" % meta_path)
+
+  # a requests.Response made from an archived one
+  def replay(self, method, url, data=None):
+    meta_path, body_path = self.paths_for(method, url, data)
+    try:
+      with open(meta_path) as f:
+        meta = json.load(f)
+      with open(body_path, "rb") as f:
+        body = f.read()
+    except IOError:
+      raise NotArchived("%s %s isn't in the archive at %s" % (method.upper(), url, self.directory))
+
+    logging.debug("## \treplaying %s" % meta_path)
+
+    response = requests.Response()
+    response.status_code = meta['status']
+    response.reason = meta['reason']
+    response.url = meta['final_url']
+    response.headers = requests.structures.CaseInsensitiveDict(meta['headers'])
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.raw = io.BytesIO(body)
+    response._content = body
+    response._content_consumed = True
+    return response
+
+
+# request bodies can be given as bytes, text, or a dict of form fields
+def body_bytes(data):
+  if not data:
+    return b""
+  if isinstance(data, dict):
+    data = urllib.parse.urlencode(sorted(data.items()))
+  if isinstance(data, str):
+    data = data.encode("utf-8")
+  return data
@@ -0,0 +1,76 @@
+# keeps a directory of cached files under a maximum total size, by throwing
+# out the least recently used ones first. a file's modification time doubles
+# as when it was last used, so reading one should touch() it.
+#
+# each entry is a file ending in `suffix`, plus any files next to it with the
+# same name and one of the `companions` suffixes (e.g. a page's metadata),
+# which are thrown out along with it but don't count towards the size.
+
+import logging
+import os
+import threading
+
+
+class SizeCap(object):
+  def __init__(self, directory, max_size, suffix, companions=(), name="files"):
+    self.directory = directory
+    self.max_bytes = int(max_size) * 1024 * 1024
+    self.suffix = suffix
+    self.companions = companions
+    self.name = name
+
+    # total size of the entries, counted up on the first write
+    self.size = None
+    self.lock = threading.Lock()
+
+  def touch(self, path):
+    try:
+      os.utime(path, None)
+    except OSError:
+      pass
+
+  def grew(self, size):
+    with self.lock:
+      if self.size is None:
+        self.size = sum([entry_size for used, entry_size, path in self.entries()])
+      else:
+        self.size += size
+
+      if self.size > self.max_bytes:
+        self.evict()
+
+  # throw out the least recently used entries, until the directory is
+  # comfortably (10%) under its maximum size, so that this doesn't happen on
+  # every write. the size is recounted from disk, since other processes
+  # share the directory.
+  def evict(self):
+    entries = sorted(self.entries())
+    self.size = sum([entry_size for used, entry_size, path in entries])
+
+    removed = 0
+    for used, entry_size, entry_path in entries:
+      if self.size <= (self.max_bytes * 0.9):
+        break
+
+      base = entry_path[:-len(self.suffix)]
+      for path in [entry_path] + [base + companion for companion in self.companions]:
+        if os.path.exists(path):
+          os.remove(path)
+      self.size -= entry_size
+      removed += 1
+
+    logging.info("## Evicted %i %s" % (removed, self.name))
+
+  # (last used, size, path) for every entry
+  def entries(self):
+    entries = []
+    for root, dirs, names in os.walk(self.directory):
+      for name in names:
+        if name.endswith(self.suffix):
+          path = os.path.join(root, name)
+          try:
+            stat = os.stat(path)
+          except OSError:
+            continue  # evicted by another process meanwhile
+          entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
@@ -0,0 +1,161 @@
+# finds elements in a page (e.g. the rows of its report table) without
+# parsing the whole page into a tree first.
+#
+# a few sites put every report they've ever published on one giant page,
+# while a scraper run usually only wants this year's. iter_elements scans the
+# page with the standard library's event-based HTMLParser, and yields the
+# source of each matching element as soon as it's been seen, as a string. a
+# scraper can then throw out rows it doesn't want with a cheap check (say, a
+# regex for the year) and only parse the rest:
+#
+#   for row in utils.iter_elements(body, "tr", within=("table", {"class": "style1"})):
+#     if not RE_THIS_YEAR.search(row):
+#       continue
+#     tds = utils.parse_html("<table>%s</table>" % row).select("td")
+#
+# `attrs` (and the attrs in `within`) are matched like parse_html's: a class
+# matches elements that have it among others, a compiled regex is searched
+# for, and anything else has to be equal.
+#
+# rows and list items are often left unclosed, so a <tr> (or <li>, <p>, <dd>,
+# <dt>) also ends when the next one starts, or when whatever holds it ends.
+
+import collections
+import html.parser
+import re
+
+CHUNK_SIZE = 64 * 1024
+
+# elements whose end tag can be left out, and what else ends them
+IMPLIED_ENDS = {
+  'tr': ('tr', 'tbody', 'thead', 'tfoot', 'table'),
+  'li': ('li', 'ul', 'ol'),
+  'p': ('p', 'div', 'table', 'ul', 'ol'),
+  'dd': ('dd', 'dt', 'dl'),
+  'dt': ('dd', 'dt', 'dl'),
+}
+
+# elements that can hold rows of their own, which don't end the outer one
+NESTING = {
+  'tr': 'table',
+  'li': ('ul', 'ol'),
+  'dd': 'dl',
+  'dt': 'dl',
+}
+
+
+def iter_elements(body, name, attrs=None, within=None):
+  scanner = ElementScanner(body, name, attrs, within)
+  for start in range(0, len(body), CHUNK_SIZE):
+    scanner.feed(body[start:start + CHUNK_SIZE])
+    while scanner.found:
+      yield scanner.found.popleft()
+
+  scanner.close()
+  scanner.end_element(len(body))
+  while scanner.found:
+    yield scanner.found.popleft()
+
+
+class ElementScanner(html.parser.HTMLParser):
+  def __init__(self, body, name, attrs=None, within=None):
+    super(ElementScanner, self).__init__(convert_charrefs=False)
+    self.body = body
+    self.name = name
+    self.attrs = attrs or {}
+    self.within = within
+
+    implied = IMPLIED_ENDS.get(name, ())
+    self.ended_by_start = set(tag for tag in implied if tag != 'table' or name != 'tr')
+    self.ended_by_end = set(implied)
+    self.nesting = NESTING.get(name, ())
+    if isinstance(self.nesting, str):
+      self.nesting = (self.nesting,)
+
+    # where each line of the page starts, to turn getpos() into offsets
+    self.line_starts = [0] + [match.end() for match in re.finditer("\n", body)]
+
+    self.found = collections.deque()
+
+    # how many containers (and of their tags) are open; without `within`,
+    # the whole page counts as the container
+    self.container_depth = 0 if within else 1
+
+    # the element being read: where it started, how deeply its own tag is
+    # nested inside it, and how many nested containers of rows it's in
+    self.start = None
+    self.depth = 0
+    self.nested = 0
+
+  # where the tag being handled starts in the page
+  def position(self):
+    line, column = self.getpos()
+    return self.line_starts[line - 1] + column
+
+  def end_element(self, end):
+    if self.start is not None:
+      self.found.append(self.body[self.start:end])
+      self.start = None
+      self.depth = 0
+      self.nested = 0
+
+  def handle_starttag(self, tag, attrs):
+    if self.within and (tag == self.within[0]):
+      if self.container_depth or matches(attrs, self.within[1]):
+        self.container_depth += 1
+
+    if not self.container_depth:
+      return
+
+    if self.start is None:
+      self.start_element(tag, attrs)
+    elif tag in self.nesting:
+      self.nested += 1
+    elif self.nested:
+      pass
+    elif tag in self.ended_by_start:
+      # e.g. <tr><td>1<tr><td>2
+      self.end_element(self.position())
+      self.start_element(tag, attrs)
+    elif tag == self.name:
+      self.depth += 1
+
+  def start_element(self, tag, attrs):
+    if (tag == self.name) and matches(attrs, self.attrs):
+      self.start = self.position()
+      self.depth = 1
+
+  def handle_endtag(self, tag):
+    if self.start is not None:
+      if self.nested:
+        if tag in self.nesting:
+          self.nested -= 1
+      elif tag == self.name:
+        self.depth -= 1
+        if self.depth == 0:
+          self.end_element(self.body.index(">", self.position()) + 1)
+      elif tag in self.ended_by_end:
+        self.end_element(self.position())
+
+    if self.within and (tag == self.within[0]) and self.container_depth:
+      self.container_depth -= 1
+      if not self.container_depth:
+        self.end_element(self.position())
+
+
+# attrs as HTMLParser gives them, i.e. a list of (name, value) pairs
+def matches(attrs, wanted):
+  attrs = dict(attrs)
+  for name, value in wanted.items():
+    actual = attrs.get(name)
+    if actual is None:
+      return False
+    if name == 'class' and isinstance(value, str):
+      if value not in actual.split():
+        return False
+    elif hasattr(value, 'search'):
+      if not value.search(actual):
+        return False
+    elif actual != value:
+      return False
+  return True
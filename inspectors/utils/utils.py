@@ -1,29 +1,148 @@
-import os, os.path, errno, sys, traceback, subprocess
+import os, os.path, errno, sys, traceback, subprocess, shutil, time
+import concurrent.futures
+import multiprocessing
+import threading
 import re, html.entities
 import json
+import hashlib
+import importlib.util
+import inspect
 import logging
 import yaml
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from datetime import datetime
 
+from . import admin, blobs, dates, files, headstore, httpcache, memo, ratelimit, replay, sizecap, streaming, warc
+
+# requests are rate limited per host, rather than with scrapelib's own global
+# throttle, so that scrapers for different agencies don't slow each other down
+import requests, scrapelib
+class Scraper(scrapelib.Scraper):
+  def request(self, method, url, **kwargs):
+    if archive and archive.replaying:
+      response = archive.replay(method, url, kwargs.get('data'))
+      if self.raise_errors and not self.accept_response(response):
+        raise scrapelib.HTTPError(response)
+      return response
+
+    if offline():
+      raise NotCached("%s %s isn't cached, and --offline is on" % (method.upper(), url))
+
+    if archive:
+      kwargs['headers'] = archive.headers_for(kwargs.get('headers'))
+
+    rate_limiter.wait(url)
+    try:
+      response = super(Scraper, self).request(method, url, **kwargs)
+    except scrapelib.HTTPError as e:
+      self.keep(method, url, kwargs, e.response)
+      raise
+
+    self.keep(method, url, kwargs, response)
+    return response
+
+  # saves a response to the --record archive and the --warc files, if any.
+  # bodies that are being streamed to disk go in the WARC once they're
+  # there instead (see write_part).
+  def keep(self, method, url, kwargs, response):
+    if archive:
+      archive.record(method, url, kwargs.get('data'), response)
+    if warc_writer and not (kwargs.get('stream') and self.accept_response(response)):
+      warc_writer.write(response)
+
 # scraper should be instantiated at class-load time, so that it can rate limit appropriately
-import scrapelib
-scraper = scrapelib.Scraper(requests_per_minute=120, retry_attempts=3)
+rate_limiter = ratelimit.HostRateLimiter(admin.config and admin.config.get('rate_limits'))
+scraper = Scraper(requests_per_minute=0, retry_attempts=3)
 scraper.user_agent = "unitedstates/inspectors-general (https://github.com/unitedstates/inspectors-general)"
 
-from . import admin
+# with --record=<dir> or --replay=<dir>, requests are saved to or answered
+# from an archive in that directory, see replay.py
+archive = None
+
+def open_archive(options):
+  global archive
+  if options.get('replay'):
+    archive = replay.Archive(options['replay'], replaying=True)
+  elif options.get('record'):
+    archive = replay.Archive(options['record'])
+  else:
+    archive = None
+
+# with --warc (or `warc: true` in admin.yml), every HTTP exchange is also
+# written to WARC files in data/warc/, see warc.py. they're closed once
+# everything else is finished, since the finishers can still download things
+# (e.g. the reports left in the pipeline).
+warc_writer = None
+
+def open_warc(options, name):
+  global warc_writer
+  if options.get('warc') or (admin.config and admin.config.get('warc')):
+    size = options.get('warc_size', warc.DEFAULT_MAX_SIZE)
+    warc_writer = warc.WarcWriter(os.path.join(data_dir(), "warc"), name, size)
+  else:
+    warc_writer = None
+
+def close_warc():
+  if warc_writer:
+    warc_writer.close()
+
+# with --offline, nothing is fetched from the network: pages come from the
+# HTTP cache (however old they are) or the --replay archive, and reports from
+# what's already in the data directory. a request for anything else raises
+# NotCached, so that a re-parse stops at the first page it can't see, rather
+# than carrying on with a hole in its results.
+def offline():
+  return options().get('offline')
+
+class NotCached(Exception):
+  pass
 
 
 # will pass correct options on to individual scrapers whether
 # run through ./igs or individually, because argv[1:] is the same
-def run(run_method):
+#
+# returns True if the scraper finished, False if it raised an exception
+# (which will already have been passed on to the admin).
+def run(run_method, name=None):
   cli_options = options()
-  configure_logging(cli_options)
+  configure_logging(cli_options, name)
+
+  if rate_limiter.shared:
+    share_rate_limits()
+
+  open_archive(cli_options)
+
+  # WARC files and admin emails are named for the scraper's module
+  scraper_name = run_method.__module__
+  if scraper_name == "__main__":
+    scraper_name = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+  open_warc(cli_options, scraper_name)
+
+  pages.clear()
+  documents.clear()
+  parsed.clear()
+  date_parser.clear()
 
   try:
     run_method(cli_options)
+    success = True
   except Exception as exception:
-    admin.notify(exception)
+    admin.notify(exception, scraper_name)
+    success = False
+
+  finish()
+  close_warc()
+  logging.info("## Memos: %s; %s; %s" % (pages.summary(), documents.summary(), parsed.summary()))
+  logging.info("## Dates: %s" % date_parser.summary())
+  return success
+
+# functions to call once a scraper is done, e.g. to wait for any
+# reports it left to be processed in the background
+finishers = []
+
+def finish():
+  while finishers:
+    finishers.pop(0)()
 
 # read options from the command line
 #   e.g. ./inspectors/usps.py --since=2012-03-04 --debug
@@ -44,7 +163,9 @@ def options():
       options[key.lower()] = value
   return options
 
-def configure_logging(options=None):
+# if a name is given (e.g. when ./igs runs several scrapers at once),
+# every log line is prefixed with it so that interleaved output stays readable
+def configure_logging(options=None, name=None):
   options = {} if not options else options
   if options.get('debug', False):
     log_level = "debug"
@@ -55,7 +176,12 @@ def configure_logging(options=None):
     print("Invalid log level (specify: debug, info, warn, error).")
     sys.exit(1)
 
-  logging.basicConfig(format='%(message)s', level=log_level.upper())
+  if name:
+    log_format = "[%s] %%(message)s" % name
+  else:
+    log_format = "%(message)s"
+
+  logging.basicConfig(format=log_format, level=log_level.upper())
 
 
 # download the data at url
@@ -64,18 +190,49 @@ def download(url, destination=None, options=None):
   cache = options.get('cache', True) # default to caching
   binary = options.get('binary', False) # default to assuming text
 
+  # pages that were already fetched during this run aren't fetched again
+  memoize = (not destination) and (not binary) and cache
+  if memoize:
+    text = pages.get(url)
+    if text is not None:
+      logging.debug("## Memoized: %s" % url)
+      return text
+
+  # with --revalidate, a cached file that's changed on the server is replaced
+  # with the current version, or kept if that can't be downloaded
+  if destination and cache and revalidate() and (not offline()) and os.path.exists(destination):
+    if is_stale(url, destination):
+      result = download_new_version(url, destination, options)
+      if result:
+        return result
+
   # check cache first
   if destination and cache and os.path.exists(destination):
     logging.info("## Cached: (%s, %s)" % (destination, url))
 
+    # files downloaded before --dedupe was turned on are stored now
+    if dedupe() and not blob_store().contains(destination):
+      blob_store().add(destination)
+
     # if a binary file is cached, we're done
     if binary:
       return True
 
     # otherwise, decode it for return
-    with open(destination, 'r') as f:
+    with open(destination, 'r', encoding='utf-8') as f:
       body = f.read()
 
+  # binary files are streamed straight to disk, rather than held in memory
+  elif binary and destination:
+    return download_stream(url, destination)
+
+  # pages that aren't saved anywhere (like listing pages) are kept in the
+  # HTTP cache instead, and only downloaded again if they've changed
+  elif (not destination) and (not binary) and cache:
+    body = download_cached(url)
+    if body is None:
+      return None
+
   # otherwise, download from the web
   else:
     try:
@@ -101,14 +258,508 @@ def download(url, destination=None, options=None):
 
     # cache content to disk
     if destination:
-      write(body, destination, binary=binary)
+      write(body, destination)
+      head_store.put(url, response.response.headers)
+      if dedupe():
+        blob_store().add(destination)
 
   # don't return binary content
   if binary:
     return True
-  else:
-    # whether from disk or web, unescape HTML entities
-    return unescape(body)
+
+  # whether from disk or web, unescape HTML entities
+  text = unescape(body)
+  if memoize:
+    pages.put(url, text, len(text))
+  return text
+
+# downloads and parses a page (see parse_html), at most once per run. the
+# same document is handed to every caller, so callers shouldn't modify it.
+def beautifulsoup_from_url(url, only=None):
+  key = (url, repr(only))
+  doc = documents.get(key)
+  if doc is None:
+    body = download(url)
+    if body is None:
+      return None
+    doc = parse_html(body, only)
+    documents.put(key, doc, len(body) * TREE_SIZE)
+  return doc
+
+# every page is parsed with lxml, which is several times faster than
+# Python's own html.parser, or with html.parser if lxml isn't installed.
+# (BeautifulSoup picks whichever is installed on its own, so pinning it here
+# also means a page parses the same way on every machine.)
+try:
+  import lxml
+  HTML_PARSER = "lxml"
+except ImportError:
+  HTML_PARSER = "html.parser"
+
+# parses a page. with `only`, just the parts of it that match are kept, and
+# nothing else on the page is turned into a tree at all, which saves time and
+# memory on big pages where one table matters. it's what SoupStrainer takes:
+# a tag name or list of names, or a (name, attrs) tuple, e.g.
+#
+#   utils.parse_html(body, only=("div", {"class": "report"}))
+#
+# a class matches elements that have it among others, as in CSS selectors.
+def parse_html(body, only=None):
+  if isinstance(only, tuple):
+    name, attrs = only
+    if isinstance(attrs.get('class'), str):
+      attrs = dict(attrs)
+      attrs['class'] = re.compile("(^|\\s)%s(\\s|$)" % re.escape(attrs['class']))
+    only = SoupStrainer(name, attrs)
+  elif only is not None and not isinstance(only, SoupStrainer):
+    only = SoupStrainer(only)
+  return BeautifulSoup(body, HTML_PARSER, parse_only=only)
+
+# yields the source of each element in a page that matches, without parsing
+# the page into a tree, so that unwanted ones can be skipped cheaply. see
+# streaming.py.
+def iter_elements(body, name, attrs=None, within=None):
+  return streaming.iter_elements(body, name, attrs, within)
+
+# runs a function that gets rows (or any other data) out of a page, and keeps
+# what it returned in cache/parsed/, so that it's only run again when the page
+# has changed, or the scraper it's from has. it's called as
+# function(body, *args), and has to return something that can be saved as
+# JSON: dicts, lists, strings and numbers, with no dates or elements.
+#
+# results are keyed by the page's sha256, the function and its arguments,
+# and a hash of the source file the function is in. results that go unused
+# are thrown out once they add up to more than parsed_cache.max_size
+# megabytes in admin.yml (256 by default).
+def parse_cached(body, function, *args):
+  key = hashlib.sha256(body.encode("utf-8"))
+  key.update(("\n%s.%s%r %s %s" % (
+    function.__module__, function.__name__, args, HTML_PARSER, source_version(function)
+  )).encode("utf-8"))
+  key = key.hexdigest()
+  path = os.path.join(parsed_cache.directory, key[:2], "%s.json" % key)
+
+  try:
+    with open(path) as f:
+      result = json.load(f)
+    parsed.hits += 1
+    parsed_cache.touch(path)
+    return result
+  except (IOError, ValueError):
+    parsed.misses += 1
+
+  result = function(body, *args)
+  write(json.dumps(result), path)
+  parsed_cache.grew(os.path.getsize(path))
+  return result
+
+# sha1 of the source file a function comes from, looked up once per file
+source_versions = {}
+
+def source_version(function):
+  path = inspect.getsourcefile(function)
+  if path not in source_versions:
+    with open(path, "rb") as f:
+      source_versions[path] = hashlib.sha1(f.read()).hexdigest()
+  return source_versions[path]
+
+# how many pages (as text) and parsed documents are remembered during a run,
+# and how much memory they can take up: 32MB of text, and roughly 128MB of
+# trees (e.g. four 1MB listing pages)
+pages = memo.Memo("pages", 64, max_weight=32 * 1024 * 1024)
+documents = memo.Memo("documents", 8, max_weight=128 * 1024 * 1024)
+
+# roughly how many bytes of memory a parsed tree takes per character of its
+# page (a table-heavy listing page takes 30-40 times its size), for weighing
+# documents
+TREE_SIZE = 30
+
+# (nothing is kept in memory for parse_cached, it only counts)
+parsed = memo.Memo("parsed rows", 0)
+
+# the datetime for the first of several formats that fits a date's text
+# (see dates.py), or None
+def parse_date(text, formats):
+  return date_parser.parse(text, formats)
+
+date_parser = dates.DateParser(4096)
+
+# downloads a page, asking the server to skip it if it hasn't changed since
+# the copy in the HTTP cache (see httpcache.py), or not asking at all if that
+# copy is recent enough. returns the page's text.
+def download_cached(url):
+  cached = http_cache.get(url)
+
+  # while recording, every page is asked for, so that the archive has it
+  recording = archive and not archive.replaying
+  if cached and (offline() or (http_cache.is_fresh(cached[0]) and not recording)):
+    logging.info("## Cached: %s" % url)
+    return cached[1]
+
+  headers = http_cache.conditional_headers(cached[0]) if cached else {}
+
+  try:
+    logging.info("## Downloading: %s" % url)
+    response = scraper.request('GET', url, headers=headers)
+  except scrapelib.HTTPError as e:
+    # intentionally print instead of using logging,
+    # so that all 404s get printed at the end of the log
+    print("Error downloading %s:\n\n%s" % (url, format_exception(e)))
+    return None
+
+  if cached and (response.status_code == 304):
+    logging.info("## \tNot modified, using cached copy")
+    http_cache.refresh(cached[0])
+    return cached[1]
+
+  body = decode(response)
+
+  # don't allow 0-byte files
+  if not body.strip():
+    return None
+
+  http_cache.put(url, response.headers, body)
+  return body
+
+# the text of a response, decoded the way scrapelib's urlopen would
+def decode(response):
+  try:
+    return response.text
+  except TypeError:
+    # use UTF8 as a default encoding if one couldn't be guessed
+    response.encoding = 'utf8'
+    return response.text
+
+# downloads a (possibly huge) file straight to disk, in chunks.
+#
+# the file is built up at <destination>.part, and only moved into place once
+# it's complete. if the download gets cut off, the .part file is kept, and the
+# next attempt (in this run, or a later one) asks the server for only the rest
+# of the file with a Range request. servers that ignore Range, or whose copy
+# of the file has changed since, send the whole file again instead.
+def download_stream(url, destination):
+  logging.info("## Downloading: %s" % url)
+  logging.info("## \tto: %s" % destination)
+
+  part_path = "%s.part" % destination
+  mkdir_p(os.path.dirname(destination))
+
+  # the same report can be saved twice at once, and must not share a .part file
+  with download_lock(destination):
+    written = None
+    for attempt in range(scraper.retry_attempts + 1):
+      try:
+        written = write_part(url, part_path)
+        break
+
+      except scrapelib.HTTPError as e:
+        # the .part file is no good to this server, start over
+        if e.response.status_code == 416:
+          discard_part(part_path)
+          continue
+
+        # intentionally print instead of using logging,
+        # so that all 404s get printed at the end of the log
+        print("Error downloading %s:\n\n%s" % (url, format_exception(e)))
+        return None
+
+      except requests.RequestException as e:
+        logging.warn("## \tDownload of %s interrupted: %s" % (url, e))
+
+    else:
+      print("Error downloading %s: interrupted too many times, keeping %s to resume from next time." % (url, part_path))
+      return None
+
+    # don't allow 0-byte files
+    if not written:
+      discard_part(part_path)
+      return None
+
+    os.replace(part_path, destination)
+    discard_part(part_path)
+
+  size, sha256, headers = written
+  logging.debug("## \t%i bytes, sha256: %s" % (size, sha256))
+  head_store.put(url, headers, size)
+  if dedupe():
+    blob_store().add(destination, sha256)
+  return True
+
+# makes one attempt at fetching whatever's missing from a .part file.
+# returns the file's (size, sha256, response headers) once complete, or None
+# if it's empty.
+def write_part(url, part_path):
+  validator_path = "%s.validator" % part_path
+
+  # only resume from a .part file if it's known which version of the file it
+  # came from, which If-Range uses to make sure it's still the same one
+  offset = 0
+  headers = {}
+  if os.path.exists(part_path) and os.path.exists(validator_path):
+    with open(validator_path) as f:
+      validator = f.read()
+    if validator:
+      offset = os.path.getsize(part_path)
+  if offset:
+    headers['Range'] = "bytes=%i-" % offset
+    headers['If-Range'] = validator
+
+  response = scraper.request('GET', url, stream=True, headers=headers)
+  try:
+    if (response.status_code == 206) and (range_start(response) == offset):
+      logging.info("## \tresuming from byte %i" % offset)
+      mode = "ab"
+    else:
+      offset = 0
+      mode = "wb"
+      write(validator_for(response), validator_path)
+
+    # bytes already on disk go into the checksum first
+    size = offset
+    digest = hashlib.sha256()
+    if offset:
+      with open(part_path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+          digest.update(chunk)
+
+    with open(part_path, mode) as f:
+      for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+        f.write(chunk)
+        digest.update(chunk)
+        size += len(chunk)
+
+  finally:
+    response.close()
+
+  # just the part of the file that came with this response
+  if warc_writer:
+    warc_writer.write(response, part_path, offset)
+
+  if size == 0:
+    return None
+  return size, digest.hexdigest(), response.headers
+
+# what to send back in If-Range: a strong ETag if there is one, else the
+# Last-Modified date. blank if neither, which makes the download unresumable.
+def validator_for(response):
+  etag = response.headers.get('ETag', '')
+  if etag and not etag.startswith("W/"):
+    return etag
+  return response.headers.get('Last-Modified', '')
+
+# e.g. "bytes 1000-4999/5000" => 1000
+def range_start(response):
+  match = re.match("bytes (\\d+)-", response.headers.get('Content-Range', ''))
+  if match:
+    return int(match.group(1))
+  return None
+
+def discard_part(part_path):
+  for path in (part_path, "%s.validator" % part_path):
+    if os.path.exists(path):
+      os.remove(path)
+
+# --revalidate checks every cached file it comes across, --revalidate=N only
+# those that haven't been checked in the last N days, so that a big archive
+# can be worked through over several runs. either way, requests go through
+# the same per-host rate limits as everything else, and several files are
+# checked at once (see download_workers), either by the --pipeline or in
+# batches (see revalidate_many and inspector.save_report).
+def revalidate():
+  return options().get('revalidate')
+
+# asks the server about a cached file (with a HEAD request), and compares
+# the answer to what it said when the file was downloaded. files checked
+# ahead of time by revalidate_many aren't asked about again.
+def is_stale(url, destination):
+  with staleness_lock:
+    stale = staleness.pop(destination, None)
+  if stale is not None:
+    return stale
+  return check_stale(url, destination)
+
+def check_stale(url, destination):
+  previous = head_store.get(url)
+
+  max_age = revalidate()
+  if previous and (max_age is not True) and max_age.isdigit():
+    if (time.time() - previous['checked']) < (int(max_age) * 24 * 60 * 60):
+      return False
+
+  logging.info("## Revalidating: %s" % url)
+  try:
+    response = scraper.request('HEAD', url, allow_redirects=True)
+  except (scrapelib.HTTPError, requests.RequestException) as e:
+    logging.warn("## \tcouldn't revalidate %s, keeping cached copy: %s" % (url, e))
+    return False
+
+  current = headstore.record_for(url, response.headers)
+
+  # files from before headers were recorded can only be compared by size,
+  # and only when that size isn't of a compressed response
+  if (not previous) and (not response.headers.get('Content-Encoding')):
+    previous = {'content_length': os.path.getsize(destination)}
+
+  if previous and headstore.changed(previous, current):
+    logging.warn("## \t%s has changed on the server" % url)
+    return True
+
+  # a changed file's new record is saved by the download of its new version,
+  # so that if that fails, the file is still taken as stale next time
+  head_store.save(current)
+  return False
+
+# is_stale() for several files at once, like head_many. the answers are kept
+# until download() gets to each file.
+staleness = {}
+staleness_lock = threading.Lock()
+
+def revalidate_many(urls, destinations):
+  with concurrent.futures.ThreadPoolExecutor(max_workers=download_workers()) as executor:
+    results = list(executor.map(check_stale, urls, destinations))
+  with staleness_lock:
+    staleness.update(zip(destinations, results))
+
+# downloads the current version of a file next to the old one, which is only
+# moved into history/ once the new one is complete. if the download fails,
+# returns None and leaves the old one where it was.
+def download_new_version(url, destination, options):
+  new_path = "%s.new" % destination
+  result = download(url, new_path, dict(options, cache=False))
+  if not result:
+    logging.warn("## \tcouldn't download the new version of %s, keeping cached copy" % url)
+    return None
+
+  keep_history(destination)
+  os.replace(new_path, destination)
+  return result
+
+# moves a file out of the way into a history/ folder next to it, named for
+# when it was last modified, e.g. history/report-20140304T120000.pdf
+def keep_history(destination):
+  directory, filename = os.path.split(destination)
+  base, ext = os.path.splitext(filename)
+  stamp = datetime.fromtimestamp(os.path.getmtime(destination)).strftime("%Y%m%dT%H%M%S")
+  history_path = os.path.join(directory, "history", "%s-%s%s" % (base, stamp, ext))
+
+  mkdir_p(os.path.dirname(history_path))
+  os.replace(destination, history_path)
+  logging.warn("## \tprevious version kept at %s" % history_path)
+
+download_locks = {}
+download_locks_lock = threading.Lock()
+
+def download_lock(destination):
+  with download_locks_lock:
+    return download_locks.setdefault(destination, threading.Lock())
+
+# download several URLs at once, returning their results in the same order,
+# as download() would have returned them one at a time. useful when a scraper
+# knows a batch of URLs up front, e.g. one listing page per year.
+#
+# requests still go through the per-host rate limiter, so this mostly saves
+# the time spent waiting on the network. the scraper's connection pool keeps
+# connections to the host alive between requests.
+#
+# use --download_workers to change how many downloads run at once (default 4).
+def download_many(urls, destinations=None, options=None):
+  if destinations is None:
+    destinations = [None] * len(urls)
+
+  with concurrent.futures.ThreadPoolExecutor(max_workers=download_workers()) as executor:
+    return list(executor.map(lambda args: download(args[0], args[1], options), zip(urls, destinations)))
+
+def download_workers():
+  return int(options().get('download_workers', 4))
+
+# what a server says about a URL when asked with a HEAD request: a dict with
+# its last_modified date, content_length and content_type (and etag, see
+# headstore.py). the answer is kept across runs, so each URL is only ever
+# asked about once; files downloaded as reports are already known.
+#
+# HTTP errors are raised, as with scraper.request.
+def head(url):
+  record = head_store.get(url)
+  if record is None:
+    logging.info("## HEAD: %s" % url)
+    response = scraper.request('HEAD', url, allow_redirects=True)
+    record = head_store.put(url, response.headers)
+  return record
+
+def has_head(url):
+  return head_store.get(url) is not None
+
+# head() for several URLs at once, like download_many. returns their records
+# in the same order, with None for any that failed.
+def head_many(urls):
+  def head_or_none(url):
+    try:
+      return head(url)
+    except (scrapelib.HTTPError, requests.RequestException) as e:
+      print("Error requesting HEAD %s:\n\n%s" % (url, format_exception(e)))
+      return None
+
+  with concurrent.futures.ThreadPoolExecutor(max_workers=download_workers()) as executor:
+    return list(executor.map(head_or_none, urls))
+
+# runs an extraction function (e.g. text_from_html) on a /data-relative path.
+#
+# with --extract_workers, each report is extracted in a worker process of its
+# own, at most that many at once, so that CPU-heavy parsing of big reports
+# isn't limited to the one core the scraper runs on. (this also turns on the
+# --pipeline, see inspector.save_report, so that there are several reports to
+# extract at once.) --extract_timeout sets how many seconds one report may
+# take, default 600, after which its worker is killed and it's given up on.
+def extract(function, path):
+  if not extract_workers():
+    return function(path)
+
+  with extraction_slots():
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=extract_in_worker, args=(function, path, sender))
+    process.start()
+    sender.close()
+
+    try:
+      if not receiver.poll(extract_timeout()):
+        logging.warn("Timed out extracting text from %s" % path)
+        return None
+      result, exception = receiver.recv()
+    except EOFError:
+      logging.warn("Extraction worker died extracting text from %s" % path)
+      return None
+    finally:
+      receiver.close()
+      if process.is_alive():
+        process.terminate()
+      process.join()
+
+  if exception:
+    raise exception
+  return result
+
+# sends back (result, None), or (None, exception) for the parent to raise
+def extract_in_worker(function, path, sender):
+  try:
+    sender.send((function(path), None))
+  except Exception as exception:
+    sender.send((None, exception))
+
+def extract_workers():
+  return int(options().get('extract_workers', 0))
+
+def extract_timeout():
+  return int(options().get('extract_timeout', 600))
+
+extraction_semaphore = None
+extraction_lock = threading.Lock()
+
+def extraction_slots():
+  global extraction_semaphore
+  with extraction_lock:
+    if extraction_semaphore is None:
+      extraction_semaphore = threading.BoundedSemaphore(extract_workers())
+    return extraction_semaphore
 
 # uses BeautifulSoup to do a naive extraction of text from HTML,
 # then writes it and returns the /data-relative path.
@@ -117,8 +768,9 @@ def text_from_html(html_path):
   text_path = "%s.txt" % os.path.splitext(html_path)[0]
   real_text_path = os.path.join(data_dir(), text_path)
 
-  html = open(real_html_path).read()
-  doc = BeautifulSoup(html)
+  with open(real_html_path, encoding='utf-8') as f:
+    html = f.read()
+  doc = parse_html(html)
 
   for node in doc.findAll(['script', 'style']):
     node.extract()
@@ -130,30 +782,57 @@ def text_from_html(html_path):
   lines = filter(None, lines)
   text = "\n".join(lines)
 
-  write(text, real_text_path, binary=False)
+  write(text, real_text_path)
   return text_path
 
 
+# whether an external tool (e.g. pdftotext) is installed. this is only looked
+# up once per process, rather than once per report, and if it's missing the
+# admin is told once, too.
+tools = {}
+
+def has_tool(name, purpose):
+  if name not in tools:
+    tools[name] = (shutil.which(name) is not None)
+    if not tools[name]:
+      logging.warn("Install %s to %s! The %s executable must be in a directory that is in your PATH environment variable." % (name, purpose, name))
+  return tools[name]
+
+# has_tool() for a Python module (e.g. pypdf)
+def has_module(name, purpose):
+  if name not in tools:
+    tools[name] = (importlib.util.find_spec(name) is not None)
+    if not tools[name]:
+      logging.warn("Install the %s module to %s (pip install %s)." % (name, purpose, name))
+  return tools[name]
+
 # uses pdftotext to get text out of PDFs,
 # then writes it and returns the /data-relative path.
 def text_from_pdf(pdf_path):
-  try:
-    subprocess.Popen(["pdftotext", "-v"], shell=False, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT).communicate()
-  except FileNotFoundError:
-    logging.warn("Install pdftotext to extract text! The pdftotext executable must be in a directory that is in your PATH environment variable.")
+  if not has_tool("pdftotext", "extract text"):
     return None
 
   real_pdf_path = os.path.join(data_dir(), pdf_path)
   text_path = "%s.txt" % os.path.splitext(pdf_path)[0]
   real_text_path = os.path.join(data_dir(), text_path)
 
+  # pdftotext writes its output in place, so it gets a temporary file that's
+  # then moved over the old text. the old text may be linked from other
+  # reports (see blobs.py), which have to keep it.
+  temp_path = files.temp_path_for(real_text_path)
   try:
-    subprocess.check_call("pdftotext -layout \"%s\" \"%s\"" % (real_pdf_path, real_text_path), shell=True)
+    subprocess.check_call(["pdftotext", "-layout", real_pdf_path, temp_path], timeout=extract_timeout())
   except subprocess.CalledProcessError as exc:
     logging.warn("Error extracting text to %s:\n\n%s" % (text_path, format_exception(exc)))
+    files.discard(temp_path)
+    return None
+  except subprocess.TimeoutExpired:
+    logging.warn("Timed out extracting text to %s" % text_path)
+    files.discard(temp_path)
     return None
 
-  if os.path.exists(real_text_path):
+  if os.path.exists(temp_path):
+    os.replace(temp_path, real_text_path)
     return text_path
   else:
     logging.warn("Text not extracted to %s" % text_path)
@@ -187,20 +866,20 @@ def parse_pdf_datetime(raw):
       return None
 
 def metadata_from_pdf(pdf_path):
-  try:
-    subprocess.Popen(["pdfinfo", "-v"], shell=False, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT).communicate()
-  except FileNotFoundError:
-    logging.warn("Install pdfinfo to extract metadata! The pdfinfo executable must be in a directory that is in your PATH environment variable.")
+  if not has_tool("pdfinfo", "extract metadata"):
     return None
 
   real_pdf_path = os.path.join(data_dir(), pdf_path)
 
   try:
-    output = subprocess.check_output("pdfinfo \"%s\"" % (real_pdf_path), shell=True)
+    output = subprocess.check_output(["pdfinfo", real_pdf_path], timeout=extract_timeout())
     output = output.decode('utf-8')
   except subprocess.CalledProcessError as exc:
     logging.warn("Error extracting metadata for %s:\n\n%s" % (pdf_path, format_exception(exc)))
     return None
+  except subprocess.TimeoutExpired:
+    logging.warn("Timed out extracting metadata for %s" % pdf_path)
+    return None
 
   metadata = {}
 
@@ -232,6 +911,90 @@ def metadata_from_pdf(pdf_path):
     return metadata
   return None
 
+# gets both the metadata and the text out of a PDF, writing the text next to
+# it. returns a (metadata, text path) tuple, either of which may be None.
+#
+# this is done by one of several backends, chosen with --pdf_backend
+# (or pdf_backend in admin.yml):
+#
+#   poppler - pdfinfo and pdftotext (the default)
+#   pypdf   - the pypdf library, which parses the PDF only once and in-process,
+#             without starting any subprocesses. install it separately with
+#             `pip install pypdf`. its text comes out less neatly laid out.
+def process_pdf(pdf_path):
+  backend = pdf_backend()
+  if backend not in PDF_BACKENDS:
+    raise ValueError("Unknown PDF backend: %s" % backend)
+  return PDF_BACKENDS[backend](pdf_path)
+
+def pdf_backend():
+  backend = options().get('pdf_backend')
+  if (not backend) and admin.config:
+    backend = admin.config.get('pdf_backend')
+  return backend or "poppler"
+
+def process_pdf_with_poppler(pdf_path):
+  return metadata_from_pdf(pdf_path), text_from_pdf(pdf_path)
+
+def process_pdf_with_pypdf(pdf_path):
+  if not has_module("pypdf", "read PDFs with it, poppler is used until then"):
+    return process_pdf_with_poppler(pdf_path)
+  import pypdf
+
+  real_pdf_path = os.path.join(data_dir(), pdf_path)
+  text_path = "%s.txt" % os.path.splitext(pdf_path)[0]
+  real_text_path = os.path.join(data_dir(), text_path)
+
+  # pypdf can fail in all sorts of ways on broken PDFs,
+  # in which case give poppler a try instead
+  try:
+    reader = pypdf.PdfReader(real_pdf_path)
+    info = reader.metadata or {}
+    metadata = {'page_count': len(reader.pages)}
+    # like pdftotext, put a form feed between pages
+    text = "\f".join([(page.extract_text() or "") for page in reader.pages])
+  except Exception as exc:
+    logging.warn("Error processing %s with pypdf, falling back to poppler:\n\n%s" % (pdf_path, format_exception(exc)))
+    return process_pdf_with_poppler(pdf_path)
+
+  for key, field in PYPDF_DATE_FIELDS:
+    if info.get(field):
+      metadata[key] = parse_pdf_date_string(str(info[field]))
+  for key, field in PYPDF_TEXT_FIELDS:
+    if info.get(field):
+      metadata[key] = str(info[field])
+
+  write(text, real_text_path)
+  return metadata, text_path
+
+PDF_BACKENDS = {
+  "poppler": process_pdf_with_poppler,
+  "pypdf": process_pdf_with_pypdf,
+}
+
+PYPDF_DATE_FIELDS = (
+  ('creation_date', '/CreationDate'),
+  ('modification_date', '/ModDate'),
+)
+PYPDF_TEXT_FIELDS = (
+  ('title', '/Title'),
+  ('keywords', '/Keywords'),
+  ('author', '/Author'),
+)
+
+# dates inside PDFs look like "D:20140304101500-05'00'"
+PDF_DATE_STRING_RE = re.compile("^(?:D:)?(\\d{4})(\\d{2})(\\d{2})")
+
+def parse_pdf_date_string(raw):
+  match = PDF_DATE_STRING_RE.match(raw.strip())
+  if match:
+    try:
+      return datetime(*[int(part) for part in match.groups()]).strftime('%Y-%m-%d')
+    except ValueError:
+      pass
+  logging.warn('Could not parse PDF date: %s' % raw)
+  return None
+
 def format_exception(exception):
   exc_type, exc_value, exc_traceback = sys.exc_info()
   return "\n".join(traceback.format_exception(exc_type, exc_value, exc_traceback))
@@ -241,19 +1004,39 @@ def data_dir():
   if admin.config and admin.config.get('data_directory'):
     return admin.config.get('data_directory')
   return "data"
+
+# with --dedupe (or `dedupe: true` in admin.yml), downloaded reports that are
+# the same file are stored only once, see blobs.py
+def dedupe():
+  return bool(options().get('dedupe') or (admin.config and admin.config.get('dedupe')))
+
+def blob_store():
+  return blobs.BlobStore(os.path.join(data_dir(), ".blobs"))
+
 def cache_dir():
   return "cache"
 
-def write(content, destination, binary=False):
-  mkdir_p(os.path.dirname(destination))
+http_cache = httpcache.HttpCache(os.path.join(cache_dir(), "http"), admin.config and admin.config.get('http_cache'))
+head_store = headstore.HeadStore(os.path.join(cache_dir(), "heads"))
+parsed_cache = sizecap.SizeCap(
+  os.path.join(cache_dir(), "parsed"),
+  ((admin.config and admin.config.get('parsed_cache')) or {}).get('max_size', 256),
+  ".json", name="parsed pages from the cache"
+)
 
-  if binary:
-    mode = "bw"
-  else:
-    mode = "w"
-  f = open(destination, mode)
-  f.write(content)
-  f.close()
+# coordinate per-host rate limits with every other process on this machine,
+# for when several scrapers run at once (see ./igs --workers)
+def share_rate_limits():
+  rate_limiter.share(os.path.join(cache_dir(), "rate_limits"))
+
+# files are written to a temporary path first, and only moved into place once
+# they're complete, so that a crash can't leave a truncated file behind
+# (which would otherwise be taken as a valid cached copy from then on).
+# bytes are written as they are, and text as UTF-8.
+def write(content, destination):
+  files.write(content, destination)
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 
 def json_for(object):
   return json.dumps(object, sort_keys=True, indent=2, default=format_datetime)
@@ -279,35 +1062,43 @@ def mkdir_p(path):
     else:
       raise
 
-# taken from http://effbot.org/zone/re-sub.htm#unescape-html
+# replaces HTML entities (named, decimal and hex) with the characters they
+# stand for, leaving any it doesn't know as they are, then takes out control
+# characters. based on http://effbot.org/zone/re-sub.htm#unescape-html
+#
+# the page is split on its entities, which are looked up in a table of
+# every entity seen so far, so that each distinct one is only worked out
+# once. text without an "&" in it isn't split at all.
 def unescape(text):
+  if "&" in text:
+    parts = ENTITY_RE.split(text)
+    for i in range(1, len(parts), 2):
+      entity = parts[i]
+      char = entity_chars.get(entity)
+      if char is None:
+        char = entity_chars[entity] = char_for_entity(entity)
+      parts[i] = char
+    text = "".join(parts)
 
-  def remove_unicode_control(str):
-    remove_re = re.compile('[\x00-\x08\x0B-\x0C\x0E-\x1F\x7F]')
-    return remove_re.sub('', str)
+  return CONTROL_RE.sub("", text)
 
-  def fixup(m):
-    text = m.group(0)
-    if text[:2] == "&#":
-      # character reference
-      try:
-        if text[:3] == "&#x":
-          return chr(int(text[3:-1], 16))
-        else:
-          return chr(int(text[2:-1]))
-      except ValueError:
-        pass
-    else:
-      # named entity
-      try:
-        text = chr(html.entities.name2codepoint[text[1:-1]])
-      except KeyError:
-        pass
-    return text # leave as is
+ENTITY_RE = re.compile(r"(&#?\w+;)")
+CONTROL_RE = re.compile("[\x00-\x08\x0B-\x0C\x0E-\x1F\x7F]")
 
-  text = re.sub("&#?\w+;", fixup, text)
-  text = remove_unicode_control(text)
-  return text
+# starts with the named entities, and gains any others as they're seen
+entity_chars = dict(("&%s;" % name, chr(codepoint)) for name, codepoint in html.entities.name2codepoint.items())
+
+def char_for_entity(entity):
+  if entity[:2] == "&#":
+    # character reference
+    try:
+      if entity[:3] == "&#x":
+        return chr(int(entity[3:-1], 16))
+      else:
+        return chr(int(entity[2:-1]))
+    except ValueError:
+      pass
+  return entity # leave as is
 
 # 'safe' scrapers listed in safe.yml
 def safe_igs():
@@ -0,0 +1,193 @@
+# writes every HTTP exchange made during a scrape to WARC files, the
+# standard format for web archives, so that reports and their metadata can be
+# derived again later from what the sites served, without asking them again.
+#
+# turned on with --warc (or `warc: true` in admin.yml). files go in
+# data/warc/, named for the scraper, when it started and its process:
+#
+#   data/warc/hhs-20140304120000-1234-00000.warc.gz
+#   data/warc/hhs-20140304120000-1234-00000.cdx
+#
+# a new file is started once one passes --warc_size megabytes (default 1024).
+# each record is its own gzip member, appended once it's complete, so a file
+# that's cut short by a crash is still readable up to its last record. the
+# .cdx file next to each one indexes its responses by URL.
+#
+# bodies are written as the scraper received them, i.e. after any gzip
+# transfer encoding was undone, so Content-Encoding and Transfer-Encoding are
+# left out of the recorded headers, and Content-Length is the body's length.
+# large downloads are copied into the WARC from the file they were saved to,
+# rather than held in memory.
+
+import base64
+import datetime
+import gzip
+import hashlib
+import logging
+import os
+import threading
+import urllib.parse
+import uuid
+
+DEFAULT_MAX_SIZE = 1024  # megabytes
+CHUNK_SIZE = 64 * 1024
+
+SKIPPED_RESPONSE_HEADERS = ('content-encoding', 'transfer-encoding', 'content-length')
+
+
+class WarcWriter(object):
+  def __init__(self, directory, prefix, max_size=DEFAULT_MAX_SIZE):
+    self.directory = directory
+    self.prefix = "%s-%s-%i" % (prefix, datetime.datetime.utcnow().strftime("%Y%m%d%H%M%S"), os.getpid())
+    self.max_bytes = int(max_size) * 1024 * 1024
+
+    self.serial = -1
+    self.file = None
+    self.index = None
+    self.lock = threading.Lock()
+
+  # writes a request record and a response record for a response. the body
+  # is the response's content, unless it was streamed to disk, in which case
+  # it's read back from payload_path, starting at offset.
+  def write(self, response, payload_path=None, offset=0):
+    if payload_path:
+      length = os.path.getsize(payload_path) - offset
+      payload = lambda: read_from(payload_path, offset)
+    else:
+      length = len(response.content)
+      payload = lambda: [response.content]
+
+    digest = hashlib.sha1()
+    for chunk in payload():
+      digest.update(chunk)
+    digest = base64.b32encode(digest.digest()).decode("ascii")
+
+    request = response.request
+    body = request_body(request)
+    date = datetime.datetime.utcnow()
+    response_id = record_id()
+
+    with self.lock:
+      self.rotate()
+
+      self.write_record("request", request.url, date, request_head(request), lambda: [body], len(body), [
+        ("WARC-Concurrent-To", response_id),
+      ])
+
+      start = self.file.tell()
+      self.write_record("response", request.url, date, response_head(response, length), payload, length, [
+        ("WARC-Record-ID", response_id),
+        ("WARC-Payload-Digest", "sha1:%s" % digest),
+      ])
+      end = self.file.tell()
+
+      mime_type = (response.headers.get('Content-Type') or "").split(";")[0].strip()
+      self.index.write("%s\n" % " ".join([
+        surt(request.url), date.strftime("%Y%m%d%H%M%S"), request.url,
+        mime_type or "-", str(response.status_code), digest,
+        response.headers.get('Location') or "-", "-",
+        str(end - start), str(start), os.path.basename(self.file.name),
+      ]))
+      self.index.flush()
+
+  # one WARC record, as one gzip member. the record's block is an HTTP head
+  # (as bytes) followed by a body, given as a function returning its chunks.
+  def write_record(self, warc_type, url, date, head, body, body_length, headers):
+    headers = dict(headers)
+    lines = [
+      "WARC/1.0",
+      "WARC-Type: %s" % warc_type,
+      "WARC-Record-ID: %s" % headers.pop("WARC-Record-ID", record_id()),
+      "WARC-Date: %s" % date.strftime("%Y-%m-%dT%H:%M:%SZ"),
+      "WARC-Target-URI: %s" % url,
+    ]
+    lines += ["%s: %s" % (name, value) for name, value in sorted(headers.items())]
+    lines += [
+      "Content-Type: application/http; msgtype=%s" % warc_type,
+      "Content-Length: %i" % (len(head) + body_length),
+    ]
+
+    with gzip.GzipFile(fileobj=self.file, mode="wb") as member:
+      member.write(("\r\n".join(lines) + "\r\n\r\n").encode("utf-8"))
+      member.write(head)
+      for chunk in body():
+        member.write(chunk)
+      member.write(b"\r\n\r\n")
+    self.file.flush()
+
+  # starts a new file on the first record, and whenever one gets too big
+  def rotate(self):
+    if self.file and (self.file.tell() < self.max_bytes):
+      return
+
+    self.close_files()
+    self.serial += 1
+    os.makedirs(self.directory, exist_ok=True)
+    base = os.path.join(self.directory, "%s-%05i" % (self.prefix, self.serial))
+    self.file = open("%s.warc.gz" % base, "ab")
+    self.index = open("%s.cdx" % base, "a")
+    self.index.write(" CDX N b a m s k r M S V g\n")
+    logging.debug("## Writing WARC to %s.warc.gz" % base)
+
+  def close(self):
+    with self.lock:
+      self.close_files()
+
+  def close_files(self):
+    if self.file:
+      self.file.close()
+      self.index.close()
+      self.file = self.index = None
+
+
+def request_head(request):
+  parsed = urllib.parse.urlparse(request.url)
+  path = parsed.path or "/"
+  if parsed.query:
+    path = "%s?%s" % (path, parsed.query)
+
+  lines = ["%s %s HTTP/1.1" % (request.method, path)]
+  if 'Host' not in request.headers:
+    lines.append("Host: %s" % parsed.netloc)
+  lines += ["%s: %s" % (name, value) for name, value in request.headers.items()]
+  return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+
+def request_body(request):
+  body = request.body or b""
+  if isinstance(body, str):
+    body = body.encode("utf-8")
+  return body
+
+# (a HEAD response has no body, so its headers are kept as they were)
+def response_head(response, length):
+  lines = ["HTTP/1.1 %i %s" % (response.status_code, response.reason or "")]
+  if response.request.method == "HEAD":
+    lines += ["%s: %s" % (name, value) for name, value in response.headers.items()]
+  else:
+    lines += [
+      "%s: %s" % (name, value) for name, value in response.headers.items()
+      if name.lower() not in SKIPPED_RESPONSE_HEADERS
+    ]
+    lines.append("Content-Length: %i" % length)
+  return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1", "replace")
+
+# the key CDX indexes sort URLs by, e.g.
+#   https://oig.hhs.gov/reports/a.pdf => gov,hhs,oig)/reports/a.pdf
+def surt(url):
+  parsed = urllib.parse.urlparse(url)
+  host = (parsed.hostname or "").lower()
+  if host.startswith("www."):
+    host = host[4:]
+  key = "%s)%s" % (",".join(reversed(host.split("."))), parsed.path.lower() or "/")
+  if parsed.query:
+    key = "%s?%s" % (key, "&".join(sorted(parsed.query.lower().split("&"))))
+  return key
+
+def record_id():
+  return "<urn:uuid:%s>" % uuid.uuid4()
+
+def read_from(path, offset):
+  with open(path, "rb") as f:
+    f.seek(offset)
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+      yield chunk